@@ -0,0 +1,145 @@
+# batch_detect.py
+"""
+Headless batch AI detection for folders of PDFs.
+
+    python batch_detect.py submissions/ --report report.jsonl --annotated-dir annotated/ --workers 4
+
+INPUT is a directory (searched recursively for *.pdf) or a manifest file listing one PDF
+path per line. Each worker process loads the detector once. Results are appended to the
+JSONL report as documents finish, so re-running the same command resumes after a crash.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+_settings = {}
+
+
+def find_pdfs(source):
+    """PDF paths from a directory (recursive) or a manifest with one path per line."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+        return sorted(paths)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in lines if p and not p.startswith("#")]
+
+
+def completed_paths(report_path):
+    """Paths already processed successfully according to an existing report."""
+    done = set()
+    if not os.path.exists(report_path):
+        return done
+    with open(report_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a partially written last line from a crash
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def _init_worker(settings):
+    """Load resources and the detector once per worker process."""
+    from utils.model_loaders import load_detector_model
+    from utils.resources import NLTK_RESOURCES, ensure_nltk
+
+    _settings.update(settings)
+    ensure_nltk(*NLTK_RESOURCES)
+    load_detector_model()
+
+
+def annotated_path(path, annotated_dir):
+    """Output path for an annotated copy; the path hash keeps same-named inputs apart."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(annotated_dir, f"{stem}-{digest}.annotated.pdf")
+
+
+def process_pdf(path):
+    """Classify one PDF and optionally write its annotated copy; returns a report record."""
+    from utils.ai_detection_utils import classify_text_hf
+    from utils.pdf_utils import extract_text_with_index, generate_annotated_pdf
+
+    start = time.perf_counter()
+    record = {"path": path}
+    try:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        # Documents already run in parallel workers, so each one is extracted serially
+        text_index = extract_text_with_index(pdf_bytes, workers=1)
+        c_map, pcts = classify_text_hf(
+            text_index.document, threshold=_settings["threshold"], batch_size=_settings["batch_size"]
+        )
+        record["sentences"] = text_index.document.sentence_count
+        record["percentages"] = pcts
+        annotated_dir = _settings.get("annotated_dir")
+        if annotated_dir:
+            out_path = annotated_path(path, annotated_dir)
+            generate_annotated_pdf(pdf_bytes, c_map, text_index=text_index, out_path=out_path)
+            record["annotated"] = out_path
+    except Exception as exc:  # one bad PDF must not stop the batch
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Directory of PDFs or manifest file")
+    parser.add_argument("--report", default="report.jsonl", help="JSONL report path (appended to)")
+    parser.add_argument("--annotated-dir", help="Also write annotated PDFs here")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.input)
+    done = completed_paths(args.report)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} PDFs found, {len(done & set(paths))} already in report, {len(todo)} to process")
+    if not todo:
+        return 0
+    if args.annotated_dir:
+        os.makedirs(args.annotated_dir, exist_ok=True)
+
+    settings = {
+        "threshold": args.threshold,
+        "batch_size": args.batch_size,
+        "annotated_dir": args.annotated_dir,
+    }
+    start = time.perf_counter()
+    finished = failed = 0
+    # spawn keeps torch/tokenizer threads out of forked children
+    context = multiprocessing.get_context("spawn")
+    with open(args.report, "a") as report, ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=context, initializer=_init_worker, initargs=(settings,)
+    ) as pool:
+        futures = [pool.submit(process_pdf, p) for p in todo]
+        for future in as_completed(futures):
+            record = future.result()
+            report.write(json.dumps(record) + "\n")
+            report.flush()
+            finished += 1
+            failed += "error" in record
+            rate = finished / (time.perf_counter() - start) * 60
+            print(f"[{finished}/{len(todo)}] {record['path']} ({rate:.1f} docs/min)", flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {finished} PDFs ({failed} failed) in {elapsed:.1f}s, "
+          f"{finished / elapsed * 60:.1f} docs/min")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
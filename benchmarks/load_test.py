@@ -0,0 +1,214 @@
+# benchmarks/load_test.py
+"""
+Concurrent-session load test of the Streamlit app with stand-in models.
+
+    python -m benchmarks.load_test [--sessions 1 2 4 8] [--pages 20] [--out report.json]
+
+Each simulated session is a Streamlit AppTest running main.py: it uploads its own
+synthetic PDF on the detection page, switches to the humanize page and humanizes a
+few paragraphs. Sessions of one concurrency level run in parallel threads of this
+process, so they share `st.cache_resource` models and compete for CPU the way real
+sessions of one server process do. The stand-in detector does a fixed amount of
+NumPy work per sentence (--detector-ms) in place of the real model.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.run_benchmarks import StandInDetector, StandInParaphraser, synthetic_pdf, synthetic_sentence
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+DEFAULT_SESSIONS = (1, 2, 4, 8)
+STEPS = ("detect", "navigate", "humanize")
+
+
+class WorkingStandInDetector(StandInDetector):
+    """Stand-in detector that spends roughly `ms_per_sentence` of BLAS work per sentence."""
+
+    def __init__(self, ms_per_sentence=2.0):
+        self.ms_per_sentence = ms_per_sentence
+        self._matrix = np.random.default_rng(0).random((256, 256))
+        start = time.perf_counter()
+        self._matrix @ self._matrix
+        self._matmul_ms = max((time.perf_counter() - start) * 1000, 1e-3)
+
+    def __call__(self, sentences, **kwargs):
+        for _ in range(int(len(sentences) * self.ms_per_sentence / self._matmul_ms)):
+            self._matrix @ self._matrix
+        return super().__call__(sentences, **kwargs)
+
+
+class _Upload:
+    """Minimal stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.size = len(data)
+        self.type = "application/pdf"
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def install_stand_ins(pages, detector_ms):
+    """Swap in stand-in models and an uploader that returns each session's synthetic PDF."""
+    import streamlit as st
+    import utils.model_loaders as model_loaders
+
+    detector = WorkingStandInDetector(detector_ms)
+    paraphraser = StandInParaphraser()
+    # Cached like the real loaders so every session shares one instance
+    model_loaders.load_detector_model = st.cache_resource(lambda backend=None: detector)
+    model_loaders.load_paraphrase_model = st.cache_resource(lambda backend=None: paraphraser)
+    model_loaders.load_small_paraphrase_model = st.cache_resource(lambda backend=None: None)
+
+    pdfs = {}
+    lock = threading.Lock()
+
+    def file_uploader(label, *args, **kwargs):
+        seed = st.session_state.get("load_test_seed", 0)
+        with lock:
+            if seed not in pdfs:
+                pdfs[seed] = synthetic_pdf(pages, seed=seed)
+        return _Upload(f"load-test-{seed}.pdf", pdfs[seed])
+
+    st.file_uploader = file_uploader
+
+
+def humanize_input(seed, paragraphs=3, sentences=8):
+    rng = random.Random(seed)
+    return "\n\n".join(" ".join(synthetic_sentence(rng) for _ in range(sentences)) for _ in range(paragraphs))
+
+
+def _widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+def run_session(seed, timeout):
+    """One user: detect a PDF, switch pages, humanize text. Returns step latencies in seconds."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state["load_test_seed"] = seed
+    latencies = {}
+
+    start = time.perf_counter()
+    at.run()
+    latencies["detect"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _widget(at.button, "Humanize AI Text").click().run()
+    latencies["navigate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _widget(at.text_area, "Enter text to humanize").input(humanize_input(seed))
+    _widget(at.button, "Humanize").click().run()
+    latencies["humanize"] = time.perf_counter() - start
+
+    if at.exception:
+        raise RuntimeError(f"Session {seed} failed: {at.exception[0].value}")
+    return latencies
+
+
+def _current_rss_mb():
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class RssSampler:
+    """Samples RSS in a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = _current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_mb())
+
+
+def percentiles(values):
+    qs = np.percentile(values, [50, 95, 99]) if values else [0.0, 0.0, 0.0]
+    return {f"p{p}": round(float(q), 3) for p, q in zip((50, 95, 99), qs)}
+
+
+def run_level(sessions, first_seed, timeout):
+    """Run `sessions` users at once; latency percentiles, throughput and memory per session."""
+    baseline_rss = _current_rss_mb()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=sessions) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda s: run_session(s, timeout), range(first_seed, first_seed + sessions)))
+        elapsed = time.perf_counter() - start
+    report = {"sessions": sessions, "seconds": round(elapsed, 3),
+              "sessions_per_min": round(sessions / elapsed * 60, 2)}
+    for step in STEPS:
+        report[step] = percentiles([r[step] for r in results])
+    report["total"] = percentiles([sum(r.values()) for r in results])
+    report["mean_session_seconds"] = round(statistics.mean(sum(r.values()) for r in results), 3)
+    report["peak_rss_mb"] = round(sampler.peak, 1)
+    report["rss_growth_per_session_mb"] = round((sampler.peak - baseline_rss) / sessions, 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", nargs="+", type=int, default=list(DEFAULT_SESSIONS),
+                        help="Concurrency levels to run, in order")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic upload")
+    parser.add_argument("--detector-ms", type=float, default=2.0, help="Stand-in detector work per sentence")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per script run")
+    parser.add_argument("--out", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    # Every upload must really be processed, not answered from a persistent cache
+    os.environ["DN_BOT_SENTENCE_CACHE"] = "0"
+    install_stand_ins(args.pages, args.detector_ms)
+
+    # One untimed session loads NLTK data, spaCy and the shared stand-ins
+    run_session(seed=-1, timeout=args.timeout)
+
+    report = {"pages": args.pages, "detector_ms": args.detector_ms, "cpu_count": os.cpu_count(), "levels": []}
+    seed = 0
+    for sessions in args.sessions:
+        level = run_level(sessions, seed, args.timeout)
+        seed += sessions
+        report["levels"].append(level)
+        print(f"{sessions:3d} sessions  total p50 {level['total']['p50']}s p95 {level['total']['p95']}s "
+              f"p99 {level['total']['p99']}s  {level['sessions_per_min']} sessions/min  "
+              f"+{level['rss_growth_per_session_mb']} MB/session (peak {level['peak_rss_mb']} MB)", flush=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# benchmarks/packing_agreement.py
+"""
+Agreement report for packed-window detection against per-sentence detection.
+
+    python -m benchmarks.packing_agreement paper.pdf [--threshold 0.8] [--no-overlap] [--out report.json]
+
+Accepts a PDF or a plain-text file.
+"""
+import argparse
+import json
+from utils.ai_detection_utils import PACKED_WINDOW_TOKENS, packing_agreement
+from utils.document import Document
+from utils.pdf_utils import extract_text_from_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--max-tokens", type=int, default=PACKED_WINDOW_TOKENS)
+    parser.add_argument("--no-overlap", action="store_true")
+    parser.add_argument("--out", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.path.lower().endswith(".pdf"):
+        with open(args.path, "rb") as f:
+            text = extract_text_from_pdf(f.read())
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            text = f.read()
+
+    report = packing_agreement(
+        Document(text).sentences,
+        threshold=args.threshold,
+        max_tokens=args.max_tokens,
+        overlap=not args.no_overlap,
+    )
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
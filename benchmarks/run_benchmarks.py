@@ -0,0 +1,370 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark of each pipeline stage on synthetic PDFs.
+
+    python -m benchmarks.run_benchmarks --baseline baseline.json --save-baseline   # once per machine
+    python -m benchmarks.run_benchmarks --baseline baseline.json [--sizes 10 100 500]
+        [--stages extract classify ...] [--out results.json]
+
+Every (stage, page count) case runs in a fresh process, so peak RSS is per case. The
+detector and paraphraser are deterministic local stand-ins, so their batching code is
+measured, unless --detector-model or --paraphrase-model point at a (tiny) local model;
+no network access is needed.
+NLTK and spaCy data are never downloaded: stages whose data is not installed are
+skipped with a message and listed under "skipped" in the results.
+With --baseline, cases slower or heavier than the baseline by more than --tolerance are
+flagged and the exit status is 1. Timings depend on the machine, so no baseline is
+shipped; record one with --save-baseline before comparing.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+STAGES = ("extract", "classify", "annotate", "minimal_rewriting", "t5_rewrite", "citation_rewrite")
+# Stages that run the detector or paraphraser through their batching code
+MODEL_STAGES = ("classify", "t5_rewrite", "citation_rewrite")
+DEFAULT_SIZES = (10, 100, 500)
+DEFAULT_TOLERANCE = 0.25
+# Cases shorter than this are too noisy to flag on wall time
+MIN_FLAG_SECONDS = 0.05
+
+WORDS = (
+    "model data results analysis study method approach framework performance evaluation "
+    "significant baseline participants survey dataset training learning robust novel findings "
+    "limitations future research effect intervention regression sample measure outcome"
+).split()
+CITATIONS = ("(Smith et al., 2019)", "(Karaman & Frazzoli, 2011, pp. 83-86)", "(Lee, 2021)")
+
+
+def synthetic_sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    sentence = " ".join(words).capitalize()
+    if rng.random() < 0.15:
+        sentence += " " + rng.choice(CITATIONS)
+    return sentence + "."
+
+
+def synthetic_pdf(pages, seed=0):
+    """A PDF of `pages` pages of prose with a running header and page-number footer."""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Journal of Synthetic Benchmarks", fontsize=9)
+        body = " ".join(synthetic_sentence(rng) for _ in range(rng.randint(25, 35)))
+        page.insert_textbox(fitz.Rect(72, 72, page.rect.width - 72, page.rect.height - 72), body, fontsize=10)
+        page.insert_text((page.rect.width / 2, page.rect.height - 40), str(page_no + 1), fontsize=9)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+class StandInTokenizer:
+    """Whitespace tokenizer with the call signature `run_detector_batched` uses."""
+
+    max_length = 512
+
+    def __call__(self, sentences, truncation=True, add_special_tokens=True, **kwargs):
+        extra = 2 if add_special_tokens else 0
+        lengths = (len(s.split()) + extra for s in sentences)
+        if truncation:
+            lengths = (min(n, self.max_length) for n in lengths)
+        return {"input_ids": [[0] * n for n in lengths]}
+
+
+class StandInDetector:
+    """
+    Deterministic local detector. It has a tokenizer and is not remote, so
+    `run_detector_batched` still measures length bucketing and batching.
+    """
+
+    remote = False
+    tokenizer = StandInTokenizer()
+
+    def __call__(self, sentences, **kwargs):
+        results = []
+        for sentence in sentences:
+            digest = hashlib.md5(sentence.encode("utf-8")).digest()
+            results.append({"label": "Fake" if digest[0] & 1 else "Real", "score": 0.5 + digest[1] / 511})
+        return results
+
+
+class _Encoding(dict):
+    """Tokenizer output that, like transformers' BatchEncoding, can be moved to a device."""
+
+    def to(self, device):
+        return self
+
+
+class StandInSeq2SeqTokenizer:
+    """Whitespace tokenizer with a growing vocabulary; id 0 is padding."""
+
+    pad_token_id = 0
+    max_length = 512
+
+    def __init__(self):
+        self._vocab = {"<pad>": 0}
+        self._words = ["<pad>"]
+        self._lock = threading.Lock()
+
+    def _id(self, word):
+        token_id = self._vocab.get(word)
+        if token_id is None:
+            with self._lock:
+                token_id = self._vocab.setdefault(word, len(self._words))
+                if token_id == len(self._words):
+                    self._words.append(word)
+        return token_id
+
+    def __call__(self, texts, padding=False, truncation=False, return_tensors=None, **kwargs):
+        ids = [[self._id(word) for word in text.split()] for text in texts]
+        if truncation:
+            ids = [row[:self.max_length] for row in ids]
+        if padding:
+            width = max(map(len, ids), default=0)
+            ids = [row + [self.pad_token_id] * (width - len(row)) for row in ids]
+        if return_tensors == "pt":
+            import torch
+
+            ids = torch.tensor(ids, dtype=torch.long)
+        return _Encoding(input_ids=ids)
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return [
+            " ".join(self._words[i] for i in row if not (skip_special_tokens and i == self.pad_token_id))
+            for row in sequences.tolist()
+        ]
+
+
+class StandInSeq2SeqModel:
+    """`generate` echoes the tokens after each prompt's "Original:", within the new-token budget."""
+
+    device = "cpu"
+
+    def __init__(self, tokenizer):
+        self._marker = tokenizer._id("Original:")
+
+    def generate(self, input_ids, max_new_tokens=512, **kwargs):
+        import torch
+
+        outputs = []
+        for row in input_ids.tolist():
+            start = len(row) - row[::-1].index(self._marker) if self._marker in row else 0
+            outputs.append([i for i in row[start:] if i][:max_new_tokens])
+        width = max(map(len, outputs), default=0)
+        return torch.tensor([row + [0] * (width - len(row)) for row in outputs], dtype=torch.long)
+
+
+class StandInParaphraser:
+    """
+    Local paraphraser that echoes each source sentence. It has a tokenizer and model and is
+    not remote, so `batch_generate` still measures length sorting, padding and batching.
+    """
+
+    remote = False
+
+    def __init__(self):
+        self.tokenizer = StandInSeq2SeqTokenizer()
+        self.model = StandInSeq2SeqModel(self.tokenizer)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _models(detector_model, paraphrase_model):
+    from utils.model_loaders import build_pipeline
+
+    detector = build_pipeline("text-classification", detector_model) if detector_model else StandInDetector()
+    paraphraser = (
+        build_pipeline("text2text-generation", paraphrase_model) if paraphrase_model else StandInParaphraser()
+    )
+    return detector, paraphraser
+
+
+def missing_data(stage):
+    """NLTK resources and spaCy models `stage` needs that are not installed locally."""
+    import nltk
+    import spacy
+
+    from utils.resources import NLTK_RESOURCES, SPACY_MODEL, TOKENIZER_RESOURCES
+
+    # Every stage splits sentences; minimal_rewriting also needs WordNet, the tagger and spaCy
+    names = NLTK_RESOURCES if stage == "minimal_rewriting" else TOKENIZER_RESOURCES
+    missing = []
+    for name in names:
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            missing.append(f"nltk:{name}")
+    if stage == "minimal_rewriting" and not spacy.util.is_package(SPACY_MODEL):
+        missing.append(f"spacy:{SPACY_MODEL}")
+    return missing
+
+
+def run_case(stage, pages, detector_model=None, paraphrase_model=None):
+    """Run one stage on a synthetic PDF in this process; returns its measurements."""
+    # Persistent caches would turn repeated runs into lookups; downloads would be timed
+    os.environ["DN_BOT_SENTENCE_CACHE"] = "0"
+    os.environ["DN_BOT_OFFLINE"] = "1"
+    import utils.ai_detection_utils as ai_detection_utils
+    import utils.citation_utils as citation_utils
+    from utils.document import Document
+    from utils.pdf_utils import extract_text_from_pdf, extract_text_with_index, generate_annotated_pdf
+
+    detector, paraphraser = _models(detector_model, paraphrase_model)
+    ai_detection_utils.load_detector_model = lambda backend=None: detector
+    citation_utils.load_paraphrase_model = lambda backend=None: paraphraser
+    citation_utils.load_small_paraphrase_model = lambda backend=None: None
+
+    pdf_bytes = synthetic_pdf(pages)
+    text = extract_text_from_pdf(pdf_bytes)
+    sentences = Document(text).sentences
+
+    if stage == "extract":
+        run = lambda: extract_text_from_pdf(pdf_bytes)
+    elif stage == "classify":
+        run = lambda: ai_detection_utils.classify_text_hf(text)
+    elif stage == "annotate":
+        text_index = extract_text_with_index(pdf_bytes)
+        c_map, _ = ai_detection_utils.classify_text_hf(text_index.document)
+        run = lambda: generate_annotated_pdf(pdf_bytes, c_map, text_index=text_index)
+    elif stage == "minimal_rewriting":
+        from pages.humanize_text import minimal_rewriting
+
+        run = lambda: minimal_rewriting(text, seed=0)
+    elif stage == "t5_rewrite":
+        from utils.humanizer import sentence_level_rewrite
+
+        run = lambda: sentence_level_rewrite(text, paraphraser)
+    elif stage == "citation_rewrite":
+        run = lambda: citation_utils.rewrite_sentences_preserving_citations(sentences, cascade=False)
+    else:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {STAGES}")
+    if stage in MODEL_STAGES:
+        # The detector and T5 batching import torch lazily; keep that out of the timing
+        importlib.import_module("torch")
+
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    return {
+        "stage": stage,
+        "pages": pages,
+        "sentences": len(sentences),
+        "seconds": round(seconds, 4),
+        "pages_per_sec": round(pages / seconds, 2) if seconds > 0 else None,
+        "sentences_per_sec": round(len(sentences) / seconds, 2) if seconds > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_isolated(stage, pages, detector_model=None, paraphrase_model=None):
+    """`run_case` in a fresh spawned process so peak RSS is not inherited from other cases."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, (stage, pages, detector_model, paraphrase_model))
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases whose wall time or peak RSS exceed the baseline by more than `tolerance`."""
+    base_cases = {(c["stage"], c["pages"]): c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        base = base_cases.get((case["stage"], case["pages"]))
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            old, new = base.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            if metric == "seconds" and max(old, new) < MIN_FLAG_SECONDS:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append({
+                    "stage": case["stage"],
+                    "pages": case["pages"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(new / old - 1, 3),
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--detector-model", help="Local detector model instead of the stand-in")
+    parser.add_argument("--paraphrase-model", help="Local text2text model instead of the stand-in")
+    parser.add_argument("--out", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite --baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+    if args.baseline and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"baseline {args.baseline} does not exist; record it first with --save-baseline")
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "detector_model": args.detector_model or "stand-in",
+        "paraphrase_model": args.paraphrase_model or "stand-in",
+        "cases": [],
+        "skipped": [],
+    }
+    for stage in args.stages:
+        missing = missing_data(stage)
+        if missing:
+            results["skipped"].append({"stage": stage, "missing": missing})
+            print(f"{stage:18s} skipped, missing {', '.join(missing)}", flush=True)
+            continue
+        for pages in args.sizes:
+            case = run_isolated(stage, pages, args.detector_model, args.paraphrase_model)
+            results["cases"].append(case)
+            print(f"{stage:18s} {pages:4d} pages  {case['seconds']:8.3f}s  "
+                  f"{case['sentences_per_sec']} sent/s  peak {case['peak_rss_mb']} MB", flush=True)
+
+    status = 0
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["regressions"] = find_regressions(results, baseline, args.tolerance)
+        for r in results["regressions"]:
+            print(f"REGRESSION {r['stage']} {r['pages']} pages: {r['metric']} "
+                  f"{r['baseline']} -> {r['current']} (+{r['change']:.0%})")
+        if not results["regressions"]:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        status = 1 if results["regressions"] else 0
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 # main.py
+import os
 import streamlit as st
-from pages.ai_detection import show_pdf_detection_page
-from pages.humanize_text import show_humanize_page
 
 def main():
     st.set_page_config(page_title="Multi-Page App: PDF & Text Humanizer", layout="wide")
@@ -21,11 +20,29 @@ def main():
         if st.button("Humanize AI Text"):
             st.session_state["current_page"] = "Humanize AI Text"
 
-    # Display the chosen page
+    # Optionally load models in the background while the user picks a page
+    if os.environ.get("DN_BOT_WARMUP", "0") == "1":
+        from utils.resources import warm_up_in_background
+
+        warm_up_in_background()
+
+    # Per-stage timings for this process, drawn after the page so they include its run
+    show_timings = st.sidebar.checkbox("Show timings", value=False)
+
+    # Display the chosen page; each page's heavy imports load only when it is first shown
     if st.session_state["current_page"] == "PDF Detection & Annotation":
+        from pages.ai_detection import show_pdf_detection_page
+
         show_pdf_detection_page()
     else:
+        from pages.humanize_text import show_humanize_page
+
         show_humanize_page()
 
+    if show_timings:
+        from utils.tracing import render_sidebar
+
+        render_sidebar()
+
 if __name__ == "__main__":
     main()
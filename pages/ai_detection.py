@@ -2,79 +2,215 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils.pdf_utils import extract_text_from_pdf, generate_annotated_pdf, word_count
-from utils.ai_detection_utils import classify_text_hf  # Defined in utils/ai_detection_utils.py
-from io import BytesIO
+from utils.ai_detection_utils import (
+    CATEGORIES,
+    confidence_histogram,
+    percentages_from_categories,
+    relabel,
+)
+from utils.model_loaders import DETECTOR_MODEL_ID, model_tag
+from utils.pdf_pipeline import preview_pdf_detection, stream_pdf_detection
+from utils.artifact_store import artifact_name, current_session_id, get_artifact_store
+from utils.pdf_utils import generate_annotated_pdf
+from utils.result_cache import get_result, result_key, store_result
+
+DEFAULT_THRESHOLD = 0.8
+
+def breakdown_chart(percentages):
+    """Bar chart of the classification percentages."""
+    df = pd.DataFrame({
+        "Category": list(percentages.keys()),
+        "Percentage": list(percentages.values())
+    })
+    color_scale = alt.Scale(
+        domain=["AI-generated", "AI-generated & AI-refined", "Human-written", "Human-written & AI-refined"],
+        range=["#ff6666", "#ff9900", "#66CC99", "#6699FF"]
+    )
+    chart = (
+        alt.Chart(df)
+        .mark_bar()
+        .encode(
+            y=alt.Y("Category:N", sort="-x"),
+            x=alt.X("Percentage:Q", title="Percentage (%)", scale=alt.Scale(domain=[0, 100])),
+            color=alt.Color("Category:N", scale=color_scale),
+            tooltip=["Category:N", "Percentage:Q"]
+        )
+        .properties(height=200, width=600)
+    )
+    return chart, df
+
+def confidence_chart(raw_labels, scores):
+    """Histogram of detector confidence, split by the detector's raw label."""
+    hist = confidence_histogram(raw_labels, scores)
+    edges = hist["edges"]
+    rows = [
+        {"Label": name, "Score": f"{edges[i]:.2f}-{edges[i + 1]:.2f}", "Sentences": int(count)}
+        for label, name in (("FAKE", "AI"), ("REAL", "Human"))
+        for i, count in enumerate(hist[label])
+    ]
+    return (
+        alt.Chart(pd.DataFrame(rows))
+        .mark_bar()
+        .encode(
+            x=alt.X("Score:N", title="Detector confidence"),
+            y=alt.Y("Sentences:Q"),
+            color=alt.Color("Label:N", scale=alt.Scale(domain=["AI", "Human"], range=["#ff6666", "#66CC99"])),
+            xOffset="Label:N",
+            tooltip=["Label:N", "Score:N", "Sentences:Q"]
+        )
+        .properties(height=200)
+    )
+
+def estimate_table(progress):
+    """Sampled estimates with their 95% confidence intervals."""
+    df = pd.DataFrame(
+        [(cat, pct, low, high) for cat, (pct, low, high) in progress["estimates"].items()],
+        columns=["Category", "Estimate (%)", "95% CI low", "95% CI high"],
+    ).set_index("Category")
+    label = "exact" if progress["exact"] else f"estimated from {progress['sampled']} of {progress['total']} sentences"
+    df.index.name = f"Category ({label})"
+    return df
 
 def show_pdf_detection_page():
     st.title("PDF Detection & Annotation")
     st.write("Upload a PDF document, classify each sentence, and download an annotated PDF with color-coded highlights.")
-    
-    # Initialize session state keys if not present
-    if "classification_map" not in st.session_state:
-        st.session_state["classification_map"] = None
+
+    # Large artifacts (annotated PDFs) live in the on-disk store, not in session_state
     if "percentages" not in st.session_state:
         st.session_state["percentages"] = None
-    if "annotated_pdf" not in st.session_state:
-        st.session_state["annotated_pdf"] = None
-    if "original_pdf_text" not in st.session_state:
-        st.session_state["original_pdf_text"] = ""
-    
+    store = get_artifact_store()
+    session_id = current_session_id()
+
     uploaded_pdf = st.file_uploader("Upload a PDF", type=["pdf"])
     if uploaded_pdf:
-        pdf_bytes = uploaded_pdf.read()
-        with st.spinner("Extracting text from PDF..."):
-            extracted = extract_text_from_pdf(pdf_bytes)
-            st.session_state["original_pdf_text"] = extracted
+        pdf_bytes = uploaded_pdf.getvalue()
+        packed = st.checkbox(
+            "Packed mode: score several sentences per detector pass (faster, approximate)"
+        )
+        # Raw scores do not depend on the threshold, so it is not part of the key
+        key = result_key(pdf_bytes, model=model_tag(DETECTOR_MODEL_ID), packed=packed)
+
+        # Widget interactions rerun the script; only a new upload or new settings reprocess
+        progress = get_result(key)
+        default_annotated = artifact_name(key, DEFAULT_THRESHOLD)
+        st.subheader("Classification Breakdown")
+        chart_slot = st.empty()
+        # Packed passes score groups of sentences, which the sentence sample cannot use
+        preview = st.checkbox(
+            "Fast preview: estimate from a sample of sentences first, then refine",
+            disabled=packed,
+            help="Not available in packed mode." if packed else None,
+        )
+        if progress is None and preview and not packed:
+            # Per upload, like the result key, so another PDF's estimate is never shown
+            stop_key = f"preview_stopped_{key}"
+            estimate_key = f"preview_estimate_{key}"
+            if st.session_state.get(stop_key):
+                estimate = st.session_state.get(estimate_key)
+                if estimate:
+                    chart_slot.altair_chart(
+                        breakdown_chart({c: v[0] for c, v in estimate["estimates"].items()})[0],
+                        use_container_width=True,
+                    )
+                    st.table(estimate_table(estimate))
+                st.info("Stopped at the estimate. Sentences classified so far are cached, so continuing is quick.")
+                st.button("Continue to exact result", on_click=st.session_state.pop, args=(stop_key, None))
+                return
 
-        if not st.session_state["original_pdf_text"].strip():
+            st.button("Stop at current estimate", on_click=st.session_state.__setitem__, args=(stop_key, True))
+            estimate_slot = st.empty()
+            with store.writing(session_id, default_annotated) as annotated_path:
+                for progress in preview_pdf_detection(
+                    pdf_bytes, threshold=DEFAULT_THRESHOLD, annotated_path=annotated_path
+                ):
+                    # Only the small estimate fields; the final progress also carries the text index and scores
+                    st.session_state[estimate_key] = {
+                        field: progress[field] for field in ("sampled", "total", "estimates", "exact")
+                    }
+                    chart_slot.altair_chart(
+                        breakdown_chart({c: v[0] for c, v in progress["estimates"].items()})[0],
+                        use_container_width=True,
+                    )
+                    estimate_slot.table(estimate_table(progress))
+            estimate_slot.empty()
+            store_result(key, progress)
+            st.session_state.pop(estimate_key, None)
+        elif progress is None:
+            progress_bar = st.progress(0.0, text="Processing PDF...")
+            with store.writing(session_id, default_annotated) as annotated_path:
+                for progress in stream_pdf_detection(
+                    pdf_bytes, threshold=DEFAULT_THRESHOLD, packed=packed, annotated_path=annotated_path
+                ):
+                    total = progress["total_pages"]
+                    progress_bar.progress(
+                        progress["pages_done"] / total if total else 1.0,
+                        text=f"Processed {progress['pages_done']} of {total} pages",
+                    )
+                    chart, _ = breakdown_chart(progress["percentages"])
+                    chart_slot.altair_chart(chart, use_container_width=True)
+            progress_bar.empty()
+            store_result(key, progress)
+
+        text = progress["text_index"].text
+        if not text.strip():
+            chart_slot.empty()
             st.error("No text could be extracted from this PDF.")
             return
 
-        with st.spinner("Classifying text..."):
-            c_map, pcts = classify_text_hf(st.session_state["original_pdf_text"])
-            st.session_state["classification_map"] = c_map
-            st.session_state["percentages"] = pcts
+        # Relabeling the stored scores is instant, so the slider never re-runs the model
+        threshold = st.slider("Confidence threshold", 0.5, 0.99, DEFAULT_THRESHOLD, 0.01)
+        raw_labels, scores = progress["raw_labels"], progress["scores"]
+        categories = relabel(raw_labels, scores, threshold)
+        st.session_state["percentages"] = percentages_from_categories(categories)
+        clean_text = progress["text_index"].clean_text
+        classification_map = {
+            clean_text[start:end]: CATEGORIES[c] for (start, end), c in zip(progress["spans"], categories.tolist())
+        }
+        chart, df = breakdown_chart(st.session_state["percentages"])
+        chart_slot.altair_chart(chart, use_container_width=True)
 
-        with st.spinner("Annotating PDF..."):
-            annotated = generate_annotated_pdf(pdf_bytes, st.session_state["classification_map"])
-            st.session_state["annotated_pdf"] = annotated
+        stats = progress["stats"]
+        st.caption(
+            f"Classified {stats['sentences']} new sentences in {round(stats['seconds'], 3)}s "
+            f"({stats['sentences_per_sec']} sentences/sec), {stats['cache_hits']} from cache, "
+            f"{stats['duplicates']} duplicates skipped."
+        )
 
         # Display classification breakdown
-        if st.session_state["percentages"]:
-            st.subheader("Classification Breakdown")
-            df = pd.DataFrame({
-                "Category": list(st.session_state["percentages"].keys()),
-                "Percentage": list(st.session_state["percentages"].values())
-            })
-            color_scale = alt.Scale(
-                domain=["AI-generated", "AI-generated & AI-refined", "Human-written", "Human-written & AI-refined"],
-                range=["#ff6666", "#ff9900", "#66CC99", "#6699FF"]
-            )
-            chart = (
-                alt.Chart(df)
-                .mark_bar()
-                .encode(
-                    y=alt.Y("Category:N", sort="-x"),
-                    x=alt.X("Percentage:Q", title="Percentage (%)", scale=alt.Scale(domain=[0, 100])),
-                    color=alt.Color("Category:N", scale=color_scale),
-                    tooltip=["Category:N", "Percentage:Q"]
+        st.table(df.set_index("Category"))
+        with st.expander("Detector Confidence Histogram"):
+            st.altair_chart(confidence_chart(raw_labels, scores), use_container_width=True)
+
+        # The streamed annotation used the default threshold; other thresholds annotate on
+        # request. A result cached by another session, or an evicted file, is re-annotated.
+        annotated_name = artifact_name(key, threshold)
+        if store.rejected(session_id, annotated_name):
+            st.warning("The annotated PDF is larger than this session's storage quota and cannot be downloaded.")
+        elif store.path(session_id, annotated_name) is None and (
+            threshold == DEFAULT_THRESHOLD or st.button(f"Annotate PDF at threshold {threshold}")
+        ):
+            with st.spinner("Annotating PDF..."), store.writing(session_id, annotated_name) as annotated_path:
+                generate_annotated_pdf(
+                    pdf_bytes, classification_map, text_index=progress["text_index"], out_path=annotated_path
                 )
-                .properties(height=200, width=600)
-            )
-            st.altair_chart(chart, use_container_width=True)
-            st.table(df.set_index("Category"))
-        
-        if st.session_state["annotated_pdf"]:
+
+        annotated = store.open(session_id, annotated_name)
+        if annotated:
             st.subheader("Download Annotated PDF")
-            st.download_button(
-                "Download Annotated PDF",
-                data=st.session_state["annotated_pdf"],
-                file_name="annotated_output.pdf",
-                mime="application/pdf"
-            )
-        
+            with annotated:
+                st.download_button(
+                    "Download Annotated PDF",
+                    data=annotated,
+                    file_name="annotated_output.pdf",
+                    mime="application/pdf"
+                )
+
+        boilerplate = progress["text_index"].boilerplate_report()
+        if boilerplate:
+            with st.expander(f"Skipped Headers & Footers ({len(boilerplate)})"):
+                st.table(pd.DataFrame(boilerplate, columns=["Repeated line", "Pages"]))
+
         with st.expander("View Extracted Text"):
-            st.text_area("Extracted PDF Text", st.session_state["original_pdf_text"], height=200)
+            st.text_area("Extracted PDF Text", text, height=200)
     else:
         st.info("Please upload a PDF to start.")
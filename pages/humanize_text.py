@@ -1,87 +1,33 @@
 import random
 import re
-import ssl
 import warnings
-import nltk
-import spacy
 import streamlit as st
-from nltk.corpus import wordnet
-from nltk.tokenize import sent_tokenize, word_tokenize
+from utils.citations import extract_citations
+from utils.document import Document
+from utils.incremental import SentenceOutputCache, changed_sentences, incremental_rewrite
+from utils.resources import NLTK_RESOURCES, ensure_nltk, get_spacy_model
+from utils.synonyms import get_synonyms, has_synsets
+from utils.tracing import span
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-########################################
-# Download needed NLTK resources
-########################################
-def download_nltk_resources():
-    try:
-        _create_unverified_https_context = ssl._create_unverified_context
-    except AttributeError:
-        pass
-    else:
-        ssl._create_default_https_context = _create_unverified_https_context
-
-    resources = ['punkt', 'averaged_perceptron_tagger',
-                 'punkt_tab', 'wordnet', 'averaged_perceptron_tagger_eng']
-    for r in resources:
-        nltk.download(r, quiet=True)
-
-download_nltk_resources()
-
-########################################
-# Prepare spaCy pipeline
-########################################
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    st.warning("spaCy en_core_web_sm model not found. Install with: python -m spacy download en_core_web_sm")
-    nlp = None
-
-########################################
-# Citation Regex
-########################################
-CITATION_REGEX = re.compile(
-    r"\(\s*[A-Za-z&\-,\.\s]+(?:et al\.\s*)?,\s*\d{4}(?:,\s*(?:pp?\.\s*\d+(?:-\d+)?))?\s*\)"
-)
-
 ########################################
 # Helper: Word & Sentence Counts
 ########################################
 def count_words(text):
-    return len(word_tokenize(text))
+    return Document.of(text).word_count
 
 def count_sentences(text):
-    return len(sent_tokenize(text))
-
-########################################
-# Step 1: Extract & Restore Citations
-########################################
-def extract_citations(text):
-    refs = CITATION_REGEX.findall(text)
-    placeholder_map = {}
-    replaced_text = text
-    for i, r in enumerate(refs, start=1):
-        placeholder = f"[[REF_{i}]]"
-        placeholder_map[placeholder] = r
-        replaced_text = replaced_text.replace(r, placeholder, 1)
-    return replaced_text, placeholder_map
-
-PLACEHOLDER_REGEX = re.compile(r"\[\s*\[\s*REF_(\d+)\s*\]\s*\]")
-
-
-def restore_citations(text, placeholder_map):
-
-    def replace_placeholder(match):
-        placeholder = match.group(0)
-        return placeholder_map.get(placeholder, placeholder)
-
-    restored = PLACEHOLDER_REGEX.sub(replace_placeholder, text)
-    return restored
-
+    return Document.of(text).sentence_count
 
 ########################################
 # Step 2: Expansions, Synonyms, & Transitions
 ########################################
+# Synonym replacement only needs POS tags
+SPACY_DISABLED = ["parser", "ner", "lemmatizer"]
+# Below this many sentences, worker start-up costs more than it saves
+MULTIPROCESS_MIN_SENTENCES = 2000
+
 contraction_map = {
     "n't": " not", "'re": " are", "'s": " is", "'ll": " will",
     "'ve": " have", "'d": " would", "'m": " am"
@@ -102,8 +48,10 @@ ACADEMIC_TRANSITIONS = [
     "As a result,",
 ]
 
-def expand_contractions(sentence):
-    tokens = word_tokenize(sentence)
+def expand_contractions(sentence, tokens=None):
+    """Expand contractions; pass `tokens` when the sentence is already tokenized."""
+    if tokens is None:
+        tokens = Document(sentence).tokens
     expanded = []
     for t in tokens:
         replaced = False
@@ -120,21 +68,25 @@ def expand_contractions(sentence):
             expanded.append(t)
     return " ".join(expanded)
 
-def replace_synonyms(sentence, p_syn=0.2):
-    if not nlp:
-        return sentence
-
-    doc = nlp(sentence)
+def replace_synonyms(sentence, p_syn=0.2, rng=random):
+    """Randomly swap content words for WordNet synonyms. Accepts a string or a tagged spaCy Doc."""
+    if isinstance(sentence, str):
+        nlp = get_spacy_model()
+        if not nlp:
+            return sentence
+        doc = nlp(sentence, disable=SPACY_DISABLED)
+    else:
+        doc = sentence
     new_tokens = []
     for token in doc:
         if "[[REF_" in token.text:
             new_tokens.append(token.text)
             continue
-        if token.pos_ in ["ADJ", "NOUN", "VERB", "ADV"] and wordnet.synsets(token.text):
-            if random.random() < p_syn:
+        if token.pos_ in ["ADJ", "NOUN", "VERB", "ADV"] and has_synsets(token.text):
+            if rng.random() < p_syn:
                 synonyms = get_synonyms(token.text, token.pos_)
                 if synonyms:
-                    new_tokens.append(random.choice(synonyms))
+                    new_tokens.append(rng.choice(synonyms))
                 else:
                     new_tokens.append(token.text)
             else:
@@ -144,34 +96,13 @@ def replace_synonyms(sentence, p_syn=0.2):
     return " ".join(new_tokens)
 
 
-def add_academic_transition(sentence, p_transition=0.2):
-    if random.random() < p_transition:
-        transition = random.choice(ACADEMIC_TRANSITIONS)
+def add_academic_transition(sentence, p_transition=0.2, rng=random):
+    if rng.random() < p_transition:
+        transition = rng.choice(ACADEMIC_TRANSITIONS)
         return f"{transition} {sentence}"
     return sentence
 
 
-def get_synonyms(word, pos):
-    wn_pos = None
-    if pos.startswith("ADJ"):
-        wn_pos = wordnet.ADJ
-    elif pos.startswith("NOUN"):
-        wn_pos = wordnet.NOUN
-    elif pos.startswith("ADV"):
-        wn_pos = wordnet.ADV
-    elif pos.startswith("VERB"):
-        wn_pos = wordnet.VERB
-
-    synonyms = set()
-    if wn_pos:
-        for syn in wordnet.synsets(word, pos=wn_pos):
-            for lemma in syn.lemmas():
-                lemma_name = lemma.name().replace("_", " ")
-                if lemma_name.lower() != word.lower():
-                    synonyms.add(lemma_name)
-    return list(synonyms)
-
-
 ########################################
 # Step 3: Minimal "Humanize" line-by-line
 ########################################
@@ -182,12 +113,55 @@ def minimal_humanize_line(line, p_syn=0.2, p_trans=0.2):
     return line
 
 
-def minimal_rewriting(text, p_syn=0.2, p_trans=0.2):
-    lines = sent_tokenize(text)
-    out_lines = [
-        minimal_humanize_line(ln, p_syn=p_syn, p_trans=p_trans) for ln in lines
+def humanize_sentences(sentences, sentence_tokens, p_syn=0.2, p_trans=0.2, n_process=1, seed=None):
+    """
+    Humanize already tokenized sentences. All sentences are POS-tagged in one `nlp.pipe`
+    stream; `n_process` > 1 spreads tagging over worker processes for large inputs.
+    Without a `seed`, random draws come from the global generator in the same order as
+    `minimal_humanize_line`. With a `seed`, each sentence draws from its own generator
+    seeded by the seed and the sentence, so its output does not depend on its neighbours.
+    """
+    lines = [
+        expand_contractions(ln, tokens=tokens)
+        for ln, tokens in zip(sentences, sentence_tokens)
     ]
-    return " ".join(out_lines)
+    nlp = get_spacy_model()
+    if nlp:
+        if len(lines) < MULTIPROCESS_MIN_SENTENCES:
+            n_process = 1
+        with span("humanize.pos_tag", sentences=len(lines), n_process=n_process):
+            lines = list(nlp.pipe(lines, disable=SPACY_DISABLED, batch_size=256, n_process=n_process))
+    out_lines = []
+    with span("humanize.rewrite", sentences=len(lines)):
+        for sentence, doc in zip(sentences, lines):
+            rng = random if seed is None else random.Random(f"{seed}\0{sentence}")
+            out_lines.append(
+                add_academic_transition(replace_synonyms(doc, p_syn=p_syn, rng=rng), p_transition=p_trans, rng=rng)
+            )
+    return out_lines
+
+
+def minimal_rewriting(text, p_syn=0.2, p_trans=0.2, n_process=1, seed=None):
+    """Humanize text sentence by sentence; see `humanize_sentences`."""
+    ensure_nltk(*NLTK_RESOURCES)
+    doc = Document.of(text)
+    return " ".join(humanize_sentences(
+        doc.sentences, doc.sentence_tokens, p_syn=p_syn, p_trans=p_trans, n_process=n_process, seed=seed
+    ))
+
+
+def normalize_punctuation_spacing(text):
+    """Remove the spaces token joining leaves around punctuation and parentheses."""
+    text = re.sub(
+        r"\s+([.,;:!?])", r"\1", text
+    )  # Remove spaces before punctuation
+    text = re.sub(
+        r"(\()\s+", r"\1", text
+    )  # Remove spaces after opening parenthesis
+    text = re.sub(
+        r"\s+(\))", r")", text
+    )  # Remove spaces before closing parenthesis
+    return text
 
 
 ########################################
@@ -203,35 +177,58 @@ def show_humanize_page():
     input_text = st.text_area("Enter text to humanize", height=200)
     p_syn = st.slider("Synonym Replacement Probability", 0.0, 1.0, 0.2, 0.05)
     p_trans = st.slider("Academic Transition Probability", 0.0, 1.0, 0.2, 0.05)
+    seed = st.number_input("Random Seed", min_value=0, value=0, step=1)
+
+    # Per-session output cache: re-running after an edit only rewrites changed sentences
+    if "humanize_cache" not in st.session_state:
+        st.session_state["humanize_cache"] = SentenceOutputCache()
 
     if st.button("Humanize"):
         if not input_text.strip():
             st.warning("Please enter some text first.")
             return
 
-        orig_wc = count_words(input_text)
-        orig_sc = count_sentences(input_text)
+        # NLTK data and spaCy are only loaded once the page is actually used
+        ensure_nltk(*NLTK_RESOURCES)
+        if get_spacy_model() is None:
+            st.warning("spaCy en_core_web_sm model not found. Install with: python -m spacy download en_core_web_sm")
+
+        input_doc = Document(input_text)
+        orig_wc = input_doc.word_count
+        orig_sc = input_doc.sentence_count
 
         with st.spinner("Rewriting text..."):
-            no_refs_text, placeholders = extract_citations(input_text)
-            partially_rewritten = minimal_rewriting(
-                no_refs_text, p_syn=p_syn, p_trans=p_trans
+            with span("citations.mask"):
+                no_refs_text, placeholders = extract_citations(input_text)
+            with span("text.split_sentences") as s:
+                masked_doc = Document(no_refs_text)
+                sentences, sentence_tokens = masked_doc.sentences, masked_doc.sentence_tokens
+                s.set(sentences=len(sentences), tokens=sum(map(len, sentence_tokens)))
+
+            def rewrite(indices):
+                return humanize_sentences(
+                    [sentences[i] for i in indices],
+                    [sentence_tokens[i] for i in indices],
+                    p_syn=p_syn, p_trans=p_trans, seed=seed,
+                )
+
+            outputs, rewritten = incremental_rewrite(
+                sentences, placeholders, ("minimal", p_syn, p_trans, seed),
+                rewrite, st.session_state["humanize_cache"],
             )
-            final_text = restore_citations(partially_rewritten, placeholders)
-
-        # Normalize spaces around punctuation
-        final_text = re.sub(
-            r"\s+([.,;:!?])", r"\1", final_text
-        )  # Remove spaces before punctuation
-        final_text = re.sub(
-            r"(\()\s+", r"\1", final_text
-        )  # Remove spaces after opening parenthesis
-        final_text = re.sub(
-            r"\s+(\))", r")", final_text
-        )  # Remove spaces before closing parenthesis
-
-        new_wc = count_words(final_text)
-        new_sc = count_sentences(final_text)
+            final_text = normalize_punctuation_spacing(" ".join(outputs))
+
+        previous = st.session_state.get("humanize_previous_sentences")
+        edited = len(changed_sentences(previous, sentences))
+        st.session_state["humanize_previous_sentences"] = sentences
+        st.caption(
+            f"{edited} of {len(sentences)} sentences changed since the last run; "
+            f"{rewritten} rewritten, {len(sentences) - rewritten} reused."
+        )
+
+        final_doc = Document(final_text)
+        new_wc = final_doc.word_count
+        new_sc = final_doc.sentence_count
 
         st.subheader("Humanized Output")
         st.text_area("Result", final_text, height=200)
@@ -0,0 +1,43 @@
+# tests/test_artifact_store.py
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from utils.artifact_store import ArtifactStore
+
+
+def _old_dir(root, name):
+    path = root / name / "session"
+    path.mkdir(parents=True)
+    (path / "doc.pdf").write_bytes(b"%PDF")
+    old = time.time() - 10 * 24 * 3600
+    for p in (path / "doc.pdf", path, path.parent):
+        os.utime(p, (old, old))
+    return path.parent
+
+
+@pytest.mark.skipif(os.name != "posix", reason="process liveness is only checked on POSIX")
+def test_stale_cleanup_keeps_live_processes(tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    live = _old_dir(tmp_path, str(os.getppid()))
+    dead = _old_dir(tmp_path, str(exited.pid))
+
+    ArtifactStore(str(tmp_path), ttl=60)
+
+    assert live.exists()
+    assert not dead.exists()
+
+
+def test_writing_evicts_least_recently_used(tmp_path):
+    store = ArtifactStore(str(tmp_path), session_quota=10)
+    for name in ("a", "b", "c"):
+        with store.writing("s", name) as path:
+            with open(path, "wb") as f:
+                f.write(b"1234")
+    assert store.path("s", "a") is None
+    assert store.path("s", "b") and store.path("s", "c")
+    assert store.usage("s") == 8
@@ -0,0 +1,26 @@
+# tests/test_inference_server.py
+import os
+import stat
+
+import pytest
+
+from utils import inference_server
+
+
+def test_authkey_file_is_random_and_owner_only(tmp_path, monkeypatch):
+    monkeypatch.delenv("DN_BOT_INFERENCE_AUTHKEY", raising=False)
+    monkeypatch.setattr(inference_server, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(inference_server, "AUTHKEY_FILE", str(tmp_path / "key"))
+
+    with pytest.raises(RuntimeError):
+        inference_server.load_authkey()
+    key = inference_server.load_authkey(create=True)
+    assert len(key) == 64
+    assert inference_server.load_authkey() == key
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(tmp_path / "key").st_mode) == 0o600
+
+
+def test_authkey_from_environment(monkeypatch):
+    monkeypatch.setenv("DN_BOT_INFERENCE_AUTHKEY", "s3cret")
+    assert inference_server.load_authkey() == b"s3cret"
@@ -0,0 +1,39 @@
+# tests/test_pdf_utils.py
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from utils.pdf_utils import annotate_spans, build_text_index, extract_text_from_pdf, extract_text_with_index
+
+
+def _pdf_with_header(pages=4):
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Journal of Tests", fontsize=9)
+        page.insert_text((72, 100), f"Body sentence number {page_no} on this page.", fontsize=10)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def test_unfiltered_index_matches_extracted_text():
+    # generate_annotated_pdf without a text_index must see the same text that
+    # extract_text_from_pdf produced, or sentences after a header lose their highlight
+    pdf_bytes = _pdf_with_header()
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    assert build_text_index(doc, filter_boilerplate=False).clean_text == extract_text_from_pdf(pdf_bytes)
+    filtered = build_text_index(doc)
+    assert "Journal of Tests" not in filtered.clean_text
+    assert len(filtered.clean_text) == len(extract_text_from_pdf(pdf_bytes))
+
+
+def test_annotate_spans_highlights_sentence_page():
+    pdf_bytes = _pdf_with_header()
+    index = extract_text_with_index(pdf_bytes, filter_boilerplate=False)
+    text = index.clean_text
+    start = text.index("Body sentence number 1")
+    end = text.index(".", start) + 1
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    annotate_spans(doc, index, [(start, end)], {text[start:end]: "AI-generated"})
+    assert [len(list(page.annots())) for page in doc] == [0, 1, 0, 0]
@@ -0,0 +1,28 @@
+# tests/test_result_cache.py
+import numpy as np
+from cachetools import TTLCache
+
+from utils import result_cache
+from utils.result_cache import approx_size, get_result, store_result
+
+
+def test_approx_size_counts_arrays_and_nested_containers():
+    scores = np.zeros(100_000, dtype=np.float32)
+    assert approx_size(scores) >= scores.nbytes
+    words = [(float(i), 1.0, 2.0, 3.0) for i in range(50_000)]
+    assert approx_size({"rects": words}) > 50_000 * 4 * 24
+
+
+def test_results_are_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(result_cache, "_results", TTLCache(maxsize=1_000_000, ttl=60, getsizeof=approx_size))
+    result = {"scores": np.zeros(100_000, dtype=np.float32)}  # about 400 kB
+    for key in ("a", "b", "c"):
+        store_result(key, result)
+    assert get_result("a") is None
+    assert get_result("b") is not None and get_result("c") is not None
+
+
+def test_result_larger_than_budget_is_not_cached(monkeypatch):
+    monkeypatch.setattr(result_cache, "_results", TTLCache(maxsize=1000, ttl=60, getsizeof=approx_size))
+    store_result("big", {"scores": np.zeros(10_000)})
+    assert get_result("big") is None
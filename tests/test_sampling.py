@@ -0,0 +1,65 @@
+# tests/test_sampling.py
+import numpy as np
+import pytest
+
+from utils.ai_detection_utils import CATEGORIES
+from utils.sampling import estimate_percentages, sample_sizes, stratified_order
+
+HUMAN = CATEGORIES.index("Human-written")
+
+
+@pytest.mark.parametrize("n", [10, 200, 800, 999])
+def test_interval_contains_estimate(n):
+    estimates = estimate_percentages(np.full(n, HUMAN), population=1000)
+    for pct, low, high in estimates.values():
+        assert 0.0 <= low <= pct <= high <= 100.0
+    assert estimates["Human-written"][0] == 100.0
+    assert estimates["AI-generated"][:2] == (0.0, 0.0)
+
+
+def test_interval_narrows_as_sample_grows():
+    rng = np.random.default_rng(0)
+    population = rng.integers(0, len(CATEGORIES), 2000)
+    widths = []
+    for n in (100, 400, 1600):
+        _, low, high = estimate_percentages(population[:n], population=2000)["Human-written"]
+        widths.append(high - low)
+    assert widths[0] > widths[1] > widths[2]
+
+
+def test_full_sample_is_exact():
+    categories = np.array([0, 0, 2, 3])
+    estimates = estimate_percentages(categories, population=4)
+    assert estimates["AI-generated"] == (50.0, 50.0, 50.0)
+    assert estimates["AI-generated & AI-refined"] == (0.0, 0.0, 0.0)
+
+
+def test_empty_sample_is_uninformative():
+    estimates = estimate_percentages(np.array([], dtype=int), population=50)
+    assert all(v == (0.0, 0.0, 100.0) for v in estimates.values())
+
+
+@pytest.mark.parametrize("total, expected", [
+    (0, [0]),
+    (150, [150]),
+    (200, [200]),
+    (1000, [200, 400, 800, 1000]),
+])
+def test_sample_sizes(total, expected):
+    assert sample_sizes(total) == expected
+
+
+def test_stratified_order_is_a_permutation():
+    strata = [0] * 30 + [1] * 10 + [2] * 60
+    order = stratified_order(strata, seed=1)
+    assert sorted(order.tolist()) == list(range(len(strata)))
+    assert order.tolist() == stratified_order(strata, seed=1).tolist()
+
+
+def test_stratified_order_prefixes_are_proportional():
+    strata = np.repeat([0, 1, 2, 3], [100, 50, 25, 25])
+    order = stratified_order(strata, seed=3)
+    for n in (20, 40, 100):
+        counts = np.bincount(strata[order[:n]], minlength=4)
+        expected = np.array([100, 50, 25, 25]) * n / len(strata)
+        assert np.all(np.abs(counts - expected) <= 1)
@@ -1,47 +1,273 @@
-import nltk
-from nltk.tokenize import sent_tokenize
-from utils.model_loaders import load_detector_model
+import time
+import numpy as np
+from utils.model_loaders import DETECTOR_MODEL_ID, load_detector_model, model_tag
+from utils.document import Document
+from utils.sentence_cache import get_sentence_cache, normalize_sentence
+from utils.tracing import span
 
-nltk.download('punkt', quiet=True)
+DEFAULT_BATCH_SIZE = 32
+# roberta's 512-token limit minus the <s> and </s> special tokens
+PACKED_WINDOW_TOKENS = 510
 
-def classify_text_hf(text, threshold=0.8):
+
+def _token_lengths(detector, sentences, special_tokens=True):
+    """Token length of each sentence, used to bucket sentences of similar size."""
+    tokenizer = getattr(detector, "tokenizer", None)
+    if tokenizer is None:
+        # Remote detectors have no local tokenizer; roughly four characters per token
+        return [max(1, len(s) // 4) for s in sentences]
+    with span("detector.tokenize", sentences=len(sentences)) as s:
+        encoded = tokenizer(sentences, truncation=True, add_special_tokens=special_tokens)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        s.set(tokens=sum(lengths))
+    return lengths
+
+
+def run_detector_batched(detector, sentences, batch_size=DEFAULT_BATCH_SIZE, stats=None):
     """
-    Splits text into sentences, uses roberta-base-openai-detector to classify each sentence
-    as AI-generated or human-written, returning a map of {sentence: label} and overall percentages.
+    Run the detector over sentences in length-sorted batches so each batch pads to a
+    similar length. Results are returned in the original sentence order.
+    If a `stats` dict is given it is filled with sentence count, batch count and sentences/sec.
     """
-    detector = load_detector_model()
-    sentences = sent_tokenize(text)
-    results = detector(sentences, truncation=True)
-
-    classification_map = {}
-    counts = {
-        "AI-generated": 0,
-        "AI-generated & AI-refined": 0,
-        "Human-written": 0,
-        "Human-written & AI-refined": 0
-    }
+    start = time.perf_counter()
+    results = [None] * len(sentences)
+    if sentences and getattr(detector, "remote", False):
+        # The shared inference server buckets and batches across sessions itself
+        with span("detector.inference", sentences=len(sentences), remote=True):
+            results = detector(sentences)
+    elif sentences:
+        import torch
+
+        lengths = _token_lengths(detector, sentences)
+        order = sorted(range(len(sentences)), key=lambda i: lengths[i])
+        with torch.inference_mode():
+            for b in range(0, len(order), batch_size):
+                idx = order[b:b + batch_size]
+                batch = [sentences[i] for i in idx]
+                with span("detector.inference", sentences=len(batch), batches=1,
+                          tokens=sum(lengths[i] for i in idx),
+                          padded_tokens=len(batch) * max(lengths[i] for i in idx)):
+                    outputs = detector(batch, batch_size=len(batch), truncation=True)
+                for i, out in zip(idx, outputs):
+                    results[i] = out
+
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats["sentences"] = len(sentences)
+        stats["batches"] = -(-len(sentences) // batch_size)
+        stats["seconds"] = round(elapsed, 3)
+        stats["sentences_per_sec"] = round(len(sentences) / elapsed, 2) if elapsed > 0 else 0.0
+    return results
+
+
+def detect_sentences(detector, sentences, batch_size=DEFAULT_BATCH_SIZE, stats=None):
+    """
+    Raw detector results for sentences. Identical sentences (after whitespace
+    normalization) are scored once, sentences found in the persistent sentence cache are
+    answered from it, and only the remaining ones are sent to the model and then cached.
+    """
+    normalized = [normalize_sentence(s) for s in sentences]
+    unique = list(dict.fromkeys(normalized))
+    cache = get_sentence_cache()
+    tag = model_tag(DETECTOR_MODEL_ID)
+    with span("detector.cache_lookup", sentences=len(unique)) as s:
+        cached = cache.get_many(tag, unique) if cache else {}
+        s.set(cache_hits=len(cached))
+    misses = [i for i in range(len(unique)) if i not in cached]
+    miss_sentences = [unique[i] for i in misses]
+    fresh = run_detector_batched(detector, miss_sentences, batch_size=batch_size, stats=stats)
+    if cache:
+        cache.put_many(tag, miss_sentences, fresh)
+
+    by_sentence = {unique[i]: out for i, out in cached.items()}
+    by_sentence.update(zip(miss_sentences, fresh))
+    if stats is not None:
+        stats["cache_hits"] = len(cached)
+        stats["duplicates"] = len(sentences) - len(unique)
+    return [by_sentence[n] for n in normalized]
 
-    for sentence, result in zip(sentences, results):
-        label = result['label'].upper()  # "FAKE" or "REAL"
-        score = result['score']
-        if label == "FAKE":
-            if score >= threshold:
-                new_label = "AI-generated"
-            else:
-                new_label = "AI-generated & AI-refined"
-        elif label == "REAL":
-            if score >= threshold:
-                new_label = "Human-written"
-            else:
-                new_label = "Human-written & AI-refined"
-        else:
-            new_label = "Human-written"
-        classification_map[sentence] = new_label
-        counts[new_label] += 1
 
+CATEGORIES = [
+    "AI-generated",
+    "AI-generated & AI-refined",
+    "Human-written",
+    "Human-written & AI-refined",
+]
+
+
+def label_result(result, threshold=0.8):
+    """Collapse a raw detector result into one of the four CATEGORIES."""
+    label = result['label'].upper()  # "FAKE" or "REAL"
+    score = result['score']
+    if label == "FAKE":
+        if score >= threshold:
+            return "AI-generated"
+        return "AI-generated & AI-refined"
+    if label == "REAL":
+        if score >= threshold:
+            return "Human-written"
+        return "Human-written & AI-refined"
+    return "Human-written"
+
+
+def percentages_from_counts(counts):
     total = sum(counts.values())
-    percentages = {
+    return {
         cat: round((count / total)*100, 2) if total > 0 else 0
         for cat, count in counts.items()
     }
-    return classification_map, percentages
+
+
+# Raw detector label codes stored alongside the scores
+FAKE, REAL, OTHER = 0, 1, 2
+
+
+def score_arrays(results):
+    """Raw detector results as NumPy arrays: (label codes, scores)."""
+    codes = {"FAKE": FAKE, "REAL": REAL}
+    raw_labels = np.fromiter(
+        (codes.get(r["label"].upper(), OTHER) for r in results), dtype=np.int8, count=len(results)
+    )
+    scores = np.fromiter((r["score"] for r in results), dtype=np.float32, count=len(results))
+    return raw_labels, scores
+
+
+def relabel(raw_labels, scores, threshold=0.8):
+    """Vectorized `label_result`: index into CATEGORIES for every sentence."""
+    confident = scores >= threshold
+    categories = np.full(raw_labels.shape, CATEGORIES.index("Human-written"), dtype=np.int8)
+    fake = raw_labels == FAKE
+    real = raw_labels == REAL
+    categories[fake & confident] = CATEGORIES.index("AI-generated")
+    categories[fake & ~confident] = CATEGORIES.index("AI-generated & AI-refined")
+    categories[real & ~confident] = CATEGORIES.index("Human-written & AI-refined")
+    return categories
+
+
+def percentages_from_categories(categories):
+    counts = np.bincount(categories, minlength=len(CATEGORIES))
+    return percentages_from_counts(dict(zip(CATEGORIES, counts.tolist())))
+
+
+def confidence_histogram(raw_labels, scores, bins=10):
+    """Per raw label, how many sentences fall in each score bin over [0.5, 1]."""
+    edges = np.linspace(0.5, 1.0, bins + 1)
+    return {
+        "edges": edges,
+        "FAKE": np.histogram(scores[raw_labels == FAKE], bins=edges)[0],
+        "REAL": np.histogram(scores[raw_labels == REAL], bins=edges)[0],
+    }
+
+
+def pack_windows(token_lengths, max_tokens=PACKED_WINDOW_TOKENS, overlap=True):
+    """
+    Group consecutive sentences into windows of at most `max_tokens` tokens, as
+    (first, end) sentence index ranges. With `overlap`, a second set of windows starts
+    halfway through each window, so most sentences are scored in two different contexts.
+    A sentence longer than `max_tokens` gets a window of its own.
+    """
+    def window_at(start):
+        end = start + 1
+        used = token_lengths[start]
+        while end < len(token_lengths) and used + token_lengths[end] + 1 <= max_tokens:
+            used += token_lengths[end] + 1  # +1 for the joining space
+            end += 1
+        return (start, end)
+
+    windows = []
+    start = 0
+    while start < len(token_lengths):
+        windows.append(window_at(start))
+        start = windows[-1][1]
+    if overlap:
+        shifted = {window_at((s + e) // 2) for s, e in windows if (s + e) // 2 > s}
+        windows.extend(sorted(shifted - set(windows)))
+    return windows
+
+
+def detect_sentences_packed(detector, sentences, max_tokens=PACKED_WINDOW_TOKENS, overlap=True,
+                            batch_size=DEFAULT_BATCH_SIZE, stats=None):
+    """
+    Score sentences by packing consecutive ones into full-length windows and running one
+    forward pass per window. Each sentence gets the mean AI probability of the windows that
+    contain it, returned as detector-style {"label", "score"} dicts.
+    Results depend on neighbouring sentences, so they bypass the sentence cache.
+    """
+    lengths = _token_lengths(detector, sentences, special_tokens=False)
+    with span("detector.pack_windows", sentences=len(sentences)) as s:
+        windows = pack_windows(lengths, max_tokens=max_tokens, overlap=overlap)
+        s.set(windows=len(windows))
+    window_texts = [" ".join(sentences[start:end]) for start, end in windows]
+    window_results = run_detector_batched(detector, window_texts, batch_size=batch_size, stats=stats)
+
+    fake_prob = np.zeros(len(sentences))
+    coverage = np.zeros(len(sentences))
+    for (start, end), result in zip(windows, window_results):
+        p = result["score"] if result["label"].upper() == "FAKE" else 1.0 - result["score"]
+        fake_prob[start:end] += p
+        coverage[start:end] += 1
+    fake_prob /= np.maximum(coverage, 1)
+
+    if stats is not None:
+        stats["forward_passes"] = len(windows)
+        stats["cache_hits"] = 0
+    return [
+        {"label": "FAKE", "score": float(p)} if p >= 0.5 else {"label": "REAL", "score": float(1.0 - p)}
+        for p in fake_prob
+    ]
+
+
+def packing_agreement(sentences, threshold=0.8, max_tokens=PACKED_WINDOW_TOKENS, overlap=True,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Compare packed-window scoring against per-sentence scoring on the same sentences."""
+    detector = load_detector_model()
+    single_stats, packed_stats = {}, {}
+    single = run_detector_batched(detector, sentences, batch_size=batch_size, stats=single_stats)
+    packed = detect_sentences_packed(
+        detector, sentences, max_tokens=max_tokens, overlap=overlap, batch_size=batch_size, stats=packed_stats
+    )
+    single_labels, single_scores = score_arrays(single)
+    packed_labels, packed_scores = score_arrays(packed)
+    single_prob = np.where(single_labels == FAKE, single_scores, 1.0 - single_scores)
+    packed_prob = np.where(packed_labels == FAKE, packed_scores, 1.0 - packed_scores)
+    n = max(len(sentences), 1)
+    return {
+        "sentences": len(sentences),
+        "forward_passes_single": len(sentences),
+        "forward_passes_packed": packed_stats["forward_passes"],
+        "seconds_single": single_stats["seconds"],
+        "seconds_packed": packed_stats["seconds"],
+        "raw_label_agreement": round(float(np.sum(single_labels == packed_labels)) / n, 4),
+        "category_agreement": round(float(np.sum(
+            relabel(single_labels, single_scores, threshold) == relabel(packed_labels, packed_scores, threshold)
+        )) / n, 4),
+        "mean_abs_probability_delta": round(float(np.mean(np.abs(single_prob - packed_prob))) if sentences else 0.0, 4),
+        "percentages_single": percentages_from_categories(relabel(single_labels, single_scores, threshold)),
+        "percentages_packed": percentages_from_categories(relabel(packed_labels, packed_scores, threshold)),
+    }
+
+
+def classify_text_hf(text, threshold=0.8, batch_size=DEFAULT_BATCH_SIZE, stats=None, packed=False):
+    """
+    Splits text into sentences, uses roberta-base-openai-detector to classify each sentence
+    as AI-generated or human-written, returning a map of {sentence: label} and overall percentages.
+    `text` may be a string or an already tokenized Document. With `packed`, consecutive
+    sentences share full-length detector windows (see `detect_sentences_packed`).
+    """
+    detector = load_detector_model()
+    with span("text.split_sentences") as s:
+        sentences = Document.of(text).sentences
+        s.set(sentences=len(sentences))
+    detect = detect_sentences_packed if packed else detect_sentences
+    with span("detector.detect_packed" if packed else "detector.detect", sentences=len(sentences)):
+        results = detect(detector, sentences, batch_size=batch_size, stats=stats)
+
+    raw_labels, scores = score_arrays(results)
+    if stats is not None:
+        stats["raw_labels"] = raw_labels
+        stats["scores"] = scores
+    categories = relabel(raw_labels, scores, threshold)
+    classification_map = {
+        sentence: CATEGORIES[c] for sentence, c in zip(sentences, categories.tolist())
+    }
+    return classification_map, percentages_from_categories(categories)
@@ -0,0 +1,197 @@
+# utils/artifact_store.py
+"""
+Temp-file store for large per-session artifacts such as annotated PDFs.
+
+Artifacts live on disk under ARTIFACT_DIR/<pid>/<session id>/ and are read back as
+streamed file handles, so they do not sit in process memory between reruns. Each
+session has a byte quota (least recently used artifacts are evicted to make room);
+sessions idle for longer than the TTL, or no longer connected, are removed by a
+periodic sweep, and the process removes its own directory at exit.
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+ARTIFACT_DIR = os.environ.get("DN_BOT_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "dn-bot-artifacts"))
+SESSION_QUOTA_BYTES = int(os.environ.get("DN_BOT_SESSION_QUOTA_MB", "200")) * 1024 * 1024
+ARTIFACT_TTL_SECONDS = int(os.environ.get("DN_BOT_ARTIFACT_TTL", "3600"))
+SWEEP_INTERVAL_SECONDS = 60
+
+
+def artifact_name(*parts, suffix=".pdf"):
+    """Filesystem-safe artifact name derived from arbitrary key parts."""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:20]
+    return f"{digest}{suffix}"
+
+
+def current_session_id():
+    """Id of the Streamlit session running this script, or "default" outside Streamlit."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx else "default"
+
+
+def _session_active(session_id):
+    """Whether a browser session is still connected; assumes yes when it cannot be told."""
+    if session_id == "default":
+        return True
+    try:
+        from streamlit.runtime import Runtime
+
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+
+class ArtifactStore:
+    def __init__(self, root, session_quota=SESSION_QUOTA_BYTES, ttl=ARTIFACT_TTL_SECONDS):
+        self.root = os.path.join(root, str(os.getpid()))
+        self.session_quota = session_quota
+        self.ttl = ttl
+        # session id -> {"last_access": t, "artifacts": OrderedDict(name -> size), LRU first,
+        #                "rejected": names dropped for being larger than the quota}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_stale_processes(root)
+
+    def _session(self, session_id):
+        session = self._sessions.setdefault(
+            session_id, {"last_access": 0.0, "artifacts": OrderedDict(), "rejected": set()}
+        )
+        session["last_access"] = time.monotonic()
+        return session
+
+    def _path(self, session_id, name):
+        return os.path.join(self.root, session_id, name)
+
+    @contextmanager
+    def writing(self, session_id, name):
+        """
+        Yield the path to write artifact `name` to; on exit the file is added to the session,
+        evicting its least recently used artifacts if the quota would be exceeded. A file
+        larger than the whole quota is discarded and reported by `rejected`.
+        """
+        self.sweep()
+        os.makedirs(os.path.join(self.root, session_id), exist_ok=True)
+        path = self._path(session_id, name)
+        try:
+            yield path
+        except BaseException:
+            # Includes Streamlit stopping the script mid-write on a rerun
+            self._remove_file(path)
+            raise
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with self._lock:
+            session = self._session(session_id)
+            artifacts = session["artifacts"]
+            artifacts.pop(name, None)
+            if size > self.session_quota:
+                self._remove_file(path)
+                session["rejected"].add(name)
+                return
+            session["rejected"].discard(name)
+            while artifacts and sum(artifacts.values()) + size > self.session_quota:
+                old_name, _ = artifacts.popitem(last=False)
+                self._remove_file(self._path(session_id, old_name))
+            artifacts[name] = size
+
+    def path(self, session_id, name):
+        """Path of a stored artifact, or None if it was never stored or has been evicted."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or name not in session["artifacts"]:
+                return None
+            path = self._path(session_id, name)
+            if not os.path.exists(path):
+                del session["artifacts"][name]
+                return None
+            self._session(session_id)["artifacts"].move_to_end(name)
+            return path
+
+    def rejected(self, session_id, name):
+        """Whether artifact `name` was discarded for exceeding the session quota."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and name in session["rejected"]
+
+    def open(self, session_id, name):
+        """Open a stored artifact for streamed binary reads, or None if it is not stored."""
+        path = self.path(session_id, name)
+        return open(path, "rb") if path else None
+
+    def usage(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return sum(session["artifacts"].values()) if session else 0
+
+    def drop_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+    def sweep(self, force=False):
+        """Remove sessions that are idle past the TTL or whose browser has disconnected."""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for session_id, session in sessions:
+            if now - session["last_access"] > self.ttl or not _session_active(session_id):
+                self.drop_session(session_id)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_stale_processes(self, root):
+        """
+        Remove directories left behind by processes that exited without cleaning up. A
+        live process's directory is never touched, however old: writing session files does
+        not update its mtime, and its own sweep already expires idle sessions.
+        """
+        for entry in os.scandir(root):
+            if not entry.is_dir() or entry.path == self.root:
+                continue
+            if not _process_alive(entry.name):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _process_alive(pid):
+    """Whether the process owning a store directory still runs; unknown counts as alive."""
+    if os.name != "posix" or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_artifact_store():
+    """Process-wide artifact store, removed again when the process exits."""
+    store = ArtifactStore(ARTIFACT_DIR)
+    atexit.register(store.close)
+    return store
@@ -0,0 +1,61 @@
+# utils/batch_rewrite.py
+import math
+from utils.tracing import span
+
+DEFAULT_GENERATION_BATCH_SIZE = 16
+
+
+def generation_budget(source_tokens, budget_ratio=1.5, min_budget=16, max_budget=512):
+    """New-token budget for a rewrite, proportional to the source length."""
+    return max(min_budget, min(max_budget, math.ceil(source_tokens * budget_ratio) + 8))
+
+
+def batch_generate(t5_pipeline, prompts, sources, batch_size=DEFAULT_GENERATION_BATCH_SIZE,
+                   budget_ratio=1.5, min_budget=16, max_budget=512, min_words=False,
+                   **generate_kwargs):
+    """
+    Run `prompts` through the model's `generate` in batches and return the decoded outputs
+    in the original order.
+
+    `sources` are the sentences being rewritten (without the instruction text); prompts are
+    sorted by source length so each batch pads to a similar size, and each batch gets a
+    new-token budget proportional to its longest source. With `min_words`, outputs must be
+    at least as many tokens as the shortest source in the batch has words.
+    """
+    if getattr(t5_pipeline, "remote", False):
+        with span("t5.generate", sentences=len(prompts), remote=True):
+            return t5_pipeline.generate(
+                prompts, sources, batch_size=batch_size, budget_ratio=budget_ratio,
+                min_budget=min_budget, max_budget=max_budget, min_words=min_words, **generate_kwargs
+            )
+
+    import torch
+
+    tokenizer = t5_pipeline.tokenizer
+    model = t5_pipeline.model
+    source_lengths = [len(ids) for ids in tokenizer(sources, add_special_tokens=False)["input_ids"]]
+    order = sorted(range(len(prompts)), key=lambda i: source_lengths[i])
+    outputs = [None] * len(prompts)
+
+    with torch.inference_mode():
+        for b in range(0, len(order), batch_size):
+            idx = order[b:b + batch_size]
+            budget = generation_budget(
+                max(source_lengths[i] for i in idx), budget_ratio, min_budget, max_budget
+            )
+            kwargs = dict(generate_kwargs, max_new_tokens=budget)
+            if min_words:
+                kwargs["min_new_tokens"] = min(
+                    budget, min(len(sources[i].split()) for i in idx)
+                )
+            encoded = tokenizer(
+                [prompts[i] for i in idx], padding=True, truncation=True, return_tensors="pt"
+            ).to(model.device)
+            with span("t5.generate", sentences=len(idx), batches=1,
+                      tokens=int(encoded["input_ids"].numel()), max_new_tokens=budget) as s:
+                generated = model.generate(**encoded, **kwargs)
+                s.set(generated_tokens=int(generated.numel()))
+            texts = tokenizer.batch_decode(generated, skip_special_tokens=True)
+            for i, text in zip(idx, texts):
+                outputs[i] = text.strip()
+    return outputs
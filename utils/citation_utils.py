@@ -1,67 +1,98 @@
 # utils/citation_utils.py
-import re
-import nltk
-from nltk.tokenize import sent_tokenize
-from utils.model_loaders import load_paraphrase_model
+import time
+from collections import Counter
+from utils.batch_rewrite import DEFAULT_GENERATION_BATCH_SIZE, batch_generate
+from utils.citations import PLACEHOLDER_REGEX, extract_citations, restore_citations
+from utils.model_loaders import load_paraphrase_model, load_small_paraphrase_model
+from utils.document import Document
+from utils.tracing import span
 
-nltk.download('punkt', quiet=True)
+PARAPHRASE_SETTINGS = {"do_sample": True, "temperature": 0.9, "top_p": 0.95}
+# Accepted rewrite length, in words, relative to the source sentence
+MIN_LENGTH_RATIO = 0.6
+MAX_LENGTH_RATIO = 1.8
 
-# A refined regex to match typical APA-like references (e.g., (Karaman & Frazzoli, 2011, pp. 83–86))
-CITATION_PATTERN = re.compile(
-    r"\(\s*[A-Za-z&\-,\.\s]+(?:et al\.\s*)?,\s*\d{4}(?:,\s*(?:pp?\.\s*\d+(?:-\d+)?))?\s*\)"
-)
+def build_rewrite_prompt(replaced):
+    return (
+        "Rewrite the following sentence to be more natural while preserving all details and references exactly. "
+        "Do NOT remove, alter, or reposition placeholders like [[REF_x]].\n\n"
+        f"Original: {replaced}"
+    )
 
-def extract_citations(sentence):
-    """Replace APA-like references with placeholders [[REF_x]] and return mapping."""
-    references = CITATION_PATTERN.findall(sentence)
-    mapping = {}
-    replaced = sentence
-    for i, ref in enumerate(references, start=1):
-        placeholder = f"[[REF_{i}]]"
-        mapping[placeholder] = ref
-        replaced = replaced.replace(ref, placeholder, 1)
-    return replaced, mapping
+def is_valid_rewrite(source, rewritten, min_ratio=MIN_LENGTH_RATIO, max_ratio=MAX_LENGTH_RATIO):
+    """True if every [[REF_x]] placeholder survives exactly once and the length ratio is sane."""
+    if Counter(PLACEHOLDER_REGEX.findall(source)) != Counter(PLACEHOLDER_REGEX.findall(rewritten)):
+        return False
+    source_words = len(source.split())
+    ratio = len(rewritten.split()) / source_words if source_words else 1.0
+    return min_ratio <= ratio <= max_ratio
 
-def restore_citations(paraphrased, mapping):
-    """Restore original citations from placeholders."""
-    result = paraphrased
-    for placeholder, ref in mapping.items():
-        result = result.replace(placeholder, ref)
-    return result
+def _paraphrase(model, sources, batch_size):
+    return batch_generate(
+        model,
+        [build_rewrite_prompt(src) for src in sources],
+        sources,
+        batch_size=batch_size,
+        max_budget=256,
+        min_words=True,
+        **PARAPHRASE_SETTINGS
+    )
 
-def rewrite_sentence_preserving_citations(sentence):
+def rewrite_sentences_preserving_citations(sentences, batch_size=DEFAULT_GENERATION_BATCH_SIZE,
+                                           cascade=True, stats=None):
     """
-    Rewrite a single sentence using a T5-based paraphraser while preserving APA citations.
+    Rewrite a list of sentences with the T5-based paraphraser in batches while preserving
+    APA citations. Sentences that are empty once citations are removed are kept unchanged.
+
+    With `cascade`, the small paraphraser rewrites every sentence first and only outputs
+    failing `is_valid_rewrite` go to the large model. If a `stats` dict is given it is
+    filled with the sentence count and seconds handled by each tier.
     """
-    replaced, mapping = extract_citations(sentence)
-    if not replaced.strip():
-        return sentence
+    outputs = list(sentences)
+    with span("citations.mask", sentences=len(sentences)):
+        masked = [extract_citations(s) for s in sentences]
+    todo = [i for i, (replaced, _) in enumerate(masked) if replaced.strip()]
+    tier_stats = {"small_sentences": 0, "small_seconds": 0.0, "large_sentences": 0, "large_seconds": 0.0}
+    if stats is not None:
+        stats.update(tier_stats)
+    if not todo:
+        return outputs
 
-    prompt = (
-        "Rewrite the following sentence to be more natural while preserving all details and references exactly. "
-        "Do NOT remove, alter, or reposition placeholders like [[REF_x]].\n\n"
-        f"Original: {replaced}"
-    )
+    rewritten = {}
+    small = load_small_paraphrase_model() if cascade else None
+    if small is not None:
+        start = time.perf_counter()
+        sources = [masked[i][0] for i in todo]
+        with span("paraphrase.small", sentences=len(sources), batch_size=batch_size) as s:
+            for i, text in zip(todo, _paraphrase(small, sources, batch_size)):
+                if is_valid_rewrite(masked[i][0], text):
+                    rewritten[i] = text
+            s.set(accepted=len(rewritten))
+        tier_stats["small_sentences"] = len(rewritten)
+        tier_stats["small_seconds"] = round(time.perf_counter() - start, 3)
 
-    paraphraser = load_paraphrase_model()
-    output = paraphraser(
-        prompt,
-        do_sample=True,
-        temperature=0.9,
-        top_p=0.95,
-        max_length=256,
-        min_length=len(replaced.split()),
-        max_new_tokens=256
-    )
-    paraphrased = output[0]["generated_text"].strip()
-    final_sentence = restore_citations(paraphrased, mapping)
-    return final_sentence
+    fallback = [i for i in todo if i not in rewritten]
+    if fallback:
+        start = time.perf_counter()
+        sources = [masked[i][0] for i in fallback]
+        with span("paraphrase.large", sentences=len(sources), batch_size=batch_size):
+            rewritten.update(zip(fallback, _paraphrase(load_paraphrase_model(), sources, batch_size)))
+        tier_stats["large_sentences"] = len(fallback)
+        tier_stats["large_seconds"] = round(time.perf_counter() - start, 3)
+
+    for i, text in rewritten.items():
+        outputs[i] = restore_citations(text, masked[i][1])
+    if stats is not None:
+        stats.update(tier_stats)
+    return outputs
+
+def rewrite_sentence_preserving_citations(sentence):
+    """
+    Rewrite a single sentence using a T5-based paraphraser while preserving APA citations.
+    """
+    return rewrite_sentences_preserving_citations([sentence])[0]
 
-def rewrite_text_preserving_citations(original_text):
+def rewrite_text_preserving_citations(original_text, stats=None):
     """Rewrite input text sentence-by-sentence, preserving APA citations."""
-    sentences = sent_tokenize(original_text)
-    output_sentences = []
-    for s in sentences:
-        new_s = rewrite_sentence_preserving_citations(s)
-        output_sentences.append(new_s)
-    return " ".join(output_sentences)
+    sentences = Document.of(original_text).sentences
+    return " ".join(rewrite_sentences_preserving_citations(sentences, stats=stats))
@@ -0,0 +1,51 @@
+# utils/citations.py
+import re
+from typing import NamedTuple
+
+# APA-like in-text references, e.g. (Karaman & Frazzoli, 2011, pp. 83-86) or (Smith et al., 2023)
+CITATION_REGEX = re.compile(
+    r"\(\s*[A-Za-z&\-,\.\s]+(?:et al\.\s*)?,\s*\d{4}(?:,\s*(?:pp?\.\s*\d+(?:-\d+)?))?\s*\)"
+)
+
+# Tolerates the spacing models sometimes insert, e.g. "[[ REF_1 ]]"
+PLACEHOLDER_REGEX = re.compile(r"\[\s*\[\s*REF_(\d+)\s*\]\s*\]")
+
+
+class MaskedText(NamedTuple):
+    """Text with citations replaced by [[REF_x]] placeholders."""
+    text: str
+    placeholder_map: dict
+
+
+def placeholder(i):
+    return f"[[REF_{i}]]"
+
+
+def mask_citations(text):
+    """Replace citations with numbered placeholders in a single pass over the text."""
+    parts = []
+    placeholder_map = {}
+    last = 0
+    for i, match in enumerate(CITATION_REGEX.finditer(text), start=1):
+        marker = placeholder(i)
+        parts.append(text[last:match.start()])
+        parts.append(marker)
+        placeholder_map[marker] = match.group(0)
+        last = match.end()
+    parts.append(text[last:])
+    return MaskedText("".join(parts), placeholder_map)
+
+
+def extract_citations(text):
+    """Replace APA-like references with placeholders [[REF_x]] and return (text, mapping)."""
+    masked = mask_citations(text)
+    return masked.text, masked.placeholder_map
+
+
+def restore_citations(text, placeholder_map):
+    """Put original references back into the text in a single pass."""
+
+    def replace_placeholder(match):
+        return placeholder_map.get(placeholder(match.group(1)), match.group(0))
+
+    return PLACEHOLDER_REGEX.sub(replace_placeholder, text)
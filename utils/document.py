@@ -0,0 +1,57 @@
+# utils/document.py
+from functools import cached_property
+from nltk.tokenize import sent_tokenize, word_tokenize
+from utils.resources import TOKENIZER_RESOURCES, ensure_nltk
+
+
+class Document:
+    """
+    A text tokenized at most once. Sentence spans, per-sentence tokens and counts are
+    computed lazily on first access and cached, so counting, detection, humanizing and
+    annotation can share one NLTK pass over the text.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def of(cls, text_or_document):
+        """Wrap a string, or return an existing Document unchanged."""
+        if isinstance(text_or_document, cls):
+            return text_or_document
+        return cls(text_or_document)
+
+    @cached_property
+    def sentence_spans(self):
+        """(start, end) character span of each sentence."""
+        ensure_nltk(*TOKENIZER_RESOURCES)
+        spans = []
+        cursor = 0
+        for sentence in sent_tokenize(self.text):
+            start = self.text.find(sentence, cursor)
+            if start < 0:
+                continue
+            cursor = start + len(sentence)
+            spans.append((start, cursor))
+        return spans
+
+    @cached_property
+    def sentences(self):
+        return [self.text[start:end] for start, end in self.sentence_spans]
+
+    @cached_property
+    def sentence_tokens(self):
+        """Word tokens of each sentence; flattened, identical to `word_tokenize(text)`."""
+        return [word_tokenize(sentence, preserve_line=True) for sentence in self.sentences]
+
+    @cached_property
+    def tokens(self):
+        return [token for tokens in self.sentence_tokens for token in tokens]
+
+    @property
+    def word_count(self):
+        return len(self.tokens)
+
+    @property
+    def sentence_count(self):
+        return len(self.sentence_spans)
@@ -1,99 +1,91 @@
 import streamlit as st
-import nltk
-import re
-from nltk.tokenize import sent_tokenize, word_tokenize
-from transformers import pipeline
-
-
-# Make sure NLTK resources are downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-
-# CITATION_REGEX: attempts to match something like (Smith et al., 2023, pp. 10-12)
-CITATION_REGEX = re.compile(
-    r"\(\s*[A-Za-z&\-,\.\s]+(?:et al\.\s*)?,\s*\d{4}(?:,\s*(?:pp?\.\s*\d+(?:-\d+)?))?\s*\)"
-)
+from utils.batch_rewrite import DEFAULT_GENERATION_BATCH_SIZE, batch_generate
+from utils.citations import extract_citations, restore_citations
+from utils.document import Document
+from utils.incremental import SentenceOutputCache, incremental_rewrite
+from utils.model_loaders import load_paraphrase_model
 
 @st.cache_resource
 def load_t5_model():
     """
     Load T5-based text2text-generation model (e.g. google/flan-t5-base) once, for speed.
+    Shares the paraphraser from utils.model_loaders, including its backend and server settings.
     """
-    return pipeline("text2text-generation", model="google/flan-t5-base")
+    return load_paraphrase_model()
 
-def extract_citations(text):
-    """
-    Replace APA-like references with placeholders [[REF_1]], [[REF_2]], etc.
-    Returns replaced_text and placeholder_map.
-    """
-    refs = CITATION_REGEX.findall(text)
-    placeholder_map = {}
-    replaced_text = text
-    for i, r in enumerate(refs, start=1):
-        placeholder = f"[[REF_{i}]]"
-        placeholder_map[placeholder] = r
-        replaced_text = replaced_text.replace(r, placeholder, 1)
-    return replaced_text, placeholder_map
-
-def restore_citations(text, placeholder_map):
-    """
-    Put original references back into the text.
-    """
-    restored = text
-    for placeholder, ref_text in placeholder_map.items():
-        restored = restored.replace(placeholder, ref_text)
-    return restored
+# Beam search, deterministic: the same sentence always gets the same rewrite
+T5_DECODING = {"do_sample": False, "num_beams": 4}
 
-def sentence_level_rewrite(text, t5_pipeline, min_len=0, max_len=512):
+def rewrite_sentences(sentences, t5_pipeline, min_len=0, max_len=512,
+                      batch_size=DEFAULT_GENERATION_BATCH_SIZE):
     """
-    Splits text by sentences, rewrites each with T5, then rejoins.
+    Rewrites sentences with T5 in length-sorted batches and returns them in order.
+    Each batch gets a generation budget proportional to its longest sentence, capped at max_len.
     """
-    sentences = sent_tokenize(text)
-    out_sents = []
-    for sent in sentences:
-        if not sent.strip():
-            continue
-        prompt = (
-            "Rewrite this sentence to sound more natural and human while preserving details.\n\n"
-            f"Original: {sent}"
-        )
-        res = t5_pipeline(
-            prompt,
-            do_sample=False,       # beam search, deterministic
-            num_beams=4,
-            min_length=max(min_len, len(word_tokenize(sent))),
-            max_length=max_len,
-            max_new_tokens=max_len
-        )
-        new_sent = res[0]["generated_text"].strip()
-        out_sents.append(new_sent)
-    return " ".join(out_sents)
-
-def minimal_humanize_text(text):
+    if not sentences:
+        return []
+    prompts = [
+        "Rewrite this sentence to sound more natural and human while preserving details.\n\n"
+        f"Original: {sent}"
+        for sent in sentences
+    ]
+    return batch_generate(
+        t5_pipeline,
+        prompts,
+        sentences,
+        batch_size=batch_size,
+        min_budget=max(16, min_len),
+        max_budget=max_len,
+        min_words=True,
+        **T5_DECODING,
+    )
+
+def sentence_level_rewrite(text, t5_pipeline, min_len=0, max_len=512,
+                           batch_size=DEFAULT_GENERATION_BATCH_SIZE):
+    """Splits text by sentences, rewrites them with T5 in batches, then rejoins."""
+    sentences = [sent for sent in Document.of(text).sentences if sent.strip()]
+    return " ".join(rewrite_sentences(sentences, t5_pipeline, min_len, max_len, batch_size))
+
+def minimal_humanize_text(text, cache=None, stats=None):
     """
     Minimal rewriting approach:
       1) Replace references with placeholders
       2) Rewrite each sentence with T5
       3) Restore references
+
+    With a `cache` (a SentenceOutputCache), sentences rewritten by an earlier call are
+    reused instead of regenerated. If a `stats` dict is given, "rewritten" is set to the
+    number of sentences actually rewritten.
     """
     # 1) placeholders
     replaced, placeholder_map = extract_citations(text)
-    
-    # 2) rewrite each sentence
+    sentences = [sent for sent in Document.of(replaced).sentences if sent.strip()]
+
+    # 2) rewrite each sentence, skipping ones already in the cache
     t5 = load_t5_model()
-    rewritten = sentence_level_rewrite(replaced, t5)
-    
-    # 3) restore references
-    final = restore_citations(rewritten, placeholder_map)
-    return final
+    if cache is None:
+        rewritten = rewrite_sentences(sentences, t5)
+        if stats is not None:
+            stats["rewritten"] = len(sentences)
+        # 3) restore references
+        return restore_citations(" ".join(rewritten), placeholder_map)
+
+    settings = ("t5",) + tuple(sorted(T5_DECODING.items()))
+    outputs, n_rewritten = incremental_rewrite(
+        sentences, placeholder_map, settings,
+        lambda indices: rewrite_sentences([sentences[i] for i in indices], t5),
+        cache,
+    )
+    if stats is not None:
+        stats["rewritten"] = n_rewritten
+    # 3) references are restored per sentence by incremental_rewrite
+    return " ".join(outputs)
 
 def count_words(text):
-    return len(word_tokenize(text))
+    return Document.of(text).word_count
 
 def count_sentences(text):
-    return len(sent_tokenize(text))
+    return Document.of(text).sentence_count
 
 ###############################################
 # Streamlit App
@@ -103,22 +95,30 @@ def main():
     st.write("A simpler approach: references → placeholders → T5 rewriting sentence by sentence → restore references.")
 
     input_text = st.text_area("Enter text", height=200)
+    if "t5_humanize_cache" not in st.session_state:
+        st.session_state["t5_humanize_cache"] = SentenceOutputCache()
     if st.button("Rewrite"):
         if not input_text.strip():
             st.warning("Please enter some text.")
             return
         
-        original_wordcount = count_words(input_text)
-        original_sentcount = count_sentences(input_text)
+        input_doc = Document(input_text)
+        original_wordcount = input_doc.word_count
+        original_sentcount = input_doc.sentence_count
         
+        rewrite_stats = {}
         with st.spinner("Rewriting text..."):
-            out_text = minimal_humanize_text(input_text)
+            out_text = minimal_humanize_text(
+                input_text, cache=st.session_state["t5_humanize_cache"], stats=rewrite_stats
+            )
 
-        new_wordcount = count_words(out_text)
-        new_sentcount = count_sentences(out_text)
+        out_doc = Document(out_text)
+        new_wordcount = out_doc.word_count
+        new_sentcount = out_doc.sentence_count
 
         st.subheader("Rewritten Output")
         st.text_area("Humanized Text", out_text, height=200)
+        st.caption(f"{rewrite_stats['rewritten']} sentences rewritten; unchanged sentences reused from the previous run.")
 
         col1, col2 = st.columns(2)
         with col1:
@@ -0,0 +1,62 @@
+# utils/incremental.py
+import difflib
+from collections import OrderedDict
+from utils.citations import restore_citations
+
+DEFAULT_MAX_SENTENCES = 5000
+
+
+class SentenceOutputCache:
+    """Bounded LRU map from (original sentence, rewrite settings) to the rewritten sentence."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_SENTENCES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def changed_sentences(previous, current):
+    """Indices of `current` sentences that are new or edited relative to `previous`."""
+    changed = []
+    matcher = difflib.SequenceMatcher(None, previous or [], current, autojunk=False)
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            changed.extend(range(j1, j2))
+    return changed
+
+
+def incremental_rewrite(sentences, placeholder_map, settings, rewrite, cache):
+    """
+    Rewrite citation-masked sentences, reusing cached outputs for sentences seen before
+    with the same `settings` (a hashable tuple of parameters, decoding options and seed).
+
+    Cache keys use each sentence with its citations restored, so renumbered placeholders
+    elsewhere in the text do not invalidate it. `rewrite(indices)` must return rewritten,
+    still-masked outputs for those sentence indices. Returns the restored outputs in
+    order and the number of sentences actually rewritten.
+    """
+    keys = [(restore_citations(s, placeholder_map), settings) for s in sentences]
+    outputs = [cache.get(key) for key in keys]
+    misses = [i for i, out in enumerate(outputs) if out is None]
+    if misses:
+        for i, out in zip(misses, rewrite(misses)):
+            outputs[i] = restore_citations(out, placeholder_map)
+            cache.put(keys[i], outputs[i])
+    return outputs, len(misses)
@@ -0,0 +1,247 @@
+# utils/inference_server.py
+"""
+Optional local inference service shared by every Streamlit process.
+
+    python -m utils.inference_server
+    DN_BOT_INFERENCE_SERVER=unix:~/.cache/dn-bot/inference.sock streamlit run main.py
+
+The server holds the detector and paraphraser once and merges requests from all
+sessions into micro-batches, flushed when `max_batch` sentences are queued or the
+oldest request has waited `max_wait_ms`. With DN_BOT_INFERENCE_SERVER set, the model
+loaders return thin clients that forward to it.
+
+Messages are pickled, so only authenticated clients may connect. The key comes from
+DN_BOT_INFERENCE_AUTHKEY or, if unset, from a random key file (mode 0600) that the
+server creates on first start and clients of the same user read. The default address
+is a unix socket only its owner can connect to.
+"""
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from utils.sentence_cache import CACHE_DIR
+
+AUTHKEY_FILE = os.path.join(CACHE_DIR, "inference-authkey")
+DEFAULT_ADDRESS = (
+    "unix:" + os.path.join(CACHE_DIR, "inference.sock") if os.name == "posix" else "127.0.0.1:8765"
+)
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 10
+
+
+def load_authkey(create=False):
+    """
+    The shared connection key: DN_BOT_INFERENCE_AUTHKEY, else the key file. With `create`
+    (the server), a missing key file is generated with owner-only permissions.
+    """
+    env_key = os.environ.get("DN_BOT_INFERENCE_AUTHKEY")
+    if env_key:
+        return env_key.encode("utf-8")
+    if create and not os.path.exists(AUTHKEY_FILE):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        try:
+            fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # another server created it first
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(AUTHKEY_FILE) as f:
+            return f.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"No inference server key: set DN_BOT_INFERENCE_AUTHKEY or start the server "
+            f"once so it creates {AUTHKEY_FILE}"
+        ) from None
+
+
+def parse_address(address):
+    """"unix:/path/to.sock" -> path, "host:port" -> (host, port)."""
+    if address.startswith("unix:"):
+        return os.path.expanduser(address[len("unix:"):])
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+class _Request:
+    def __init__(self, items, options):
+        self.items = items
+        self.options = options
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects requests on a queue and runs `run_batch(items, options)` over the items of
+    several requests at once. Only requests with identical options share a batch.
+    """
+
+    def __init__(self, run_batch, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, items, options=None):
+        request = _Request(list(items), dict(options or {}))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error:
+            raise RuntimeError(request.error)
+        return request.result
+
+    def _collect(self):
+        first = self._queue.get()
+        pending = [first]
+        size = len(first.items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            size += len(request.items)
+        return pending
+
+    def _loop(self):
+        while True:
+            groups = {}
+            for request in self._collect():
+                key = tuple(sorted(request.options.items()))
+                groups.setdefault(key, []).append(request)
+            for requests in groups.values():
+                items = [item for r in requests for item in r.items]
+                try:
+                    results = self.run_batch(items, requests[0].options)
+                except Exception as exc:
+                    for r in requests:
+                        r.error = f"{type(exc).__name__}: {exc}"
+                        r.done.set()
+                    continue
+                offset = 0
+                for r in requests:
+                    r.result = results[offset:offset + len(r.items)]
+                    offset += len(r.items)
+                    r.done.set()
+
+
+def serve(address, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, backend=None):
+    """Load both models once and answer requests from any number of client connections."""
+    from utils.ai_detection_utils import run_detector_batched
+    from utils.batch_rewrite import batch_generate
+    from utils.model_loaders import (
+        DETECTOR_MODEL_ID,
+        PARAPHRASE_MODEL_ID,
+        build_pipeline,
+    )
+
+    detector = build_pipeline("text-classification", DETECTOR_MODEL_ID, backend)
+    paraphraser = build_pipeline("text2text-generation", PARAPHRASE_MODEL_ID, backend)
+
+    def classify(items, options):
+        return run_detector_batched(detector, items, batch_size=max_batch)
+
+    def generate(items, options):
+        prompts = [prompt for prompt, _ in items]
+        sources = [source for _, source in items]
+        return batch_generate(paraphraser, prompts, sources, **options)
+
+    batchers = {
+        "classify": MicroBatcher(classify, max_batch, max_wait_ms),
+        "generate": MicroBatcher(generate, max_batch, max_wait_ms),
+    }
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    task, items, options = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(("ok", batchers[task].submit(items, options)))
+                except Exception as exc:
+                    conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+    authkey = load_authkey(create=True)
+    parsed = parse_address(address)
+    if isinstance(parsed, str):
+        os.makedirs(os.path.dirname(parsed) or ".", exist_ok=True)
+        if os.path.exists(parsed):
+            os.unlink(parsed)
+        # The socket is created owner-only, so other local users cannot even connect
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(parsed, authkey=authkey)
+        finally:
+            os.umask(old_umask)
+    else:
+        listener = Listener(parsed, authkey=authkey)
+    with listener:
+        print(f"Inference server listening on {address}", flush=True)
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+class _RemoteModel:
+    """Base for thin clients; keeps one connection per thread."""
+
+    remote = True
+
+    def __init__(self, address):
+        self.address = parse_address(address)
+        self.authkey = load_authkey()
+        self._local = threading.local()
+
+    def _call(self, task, items, options=None):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        conn.send((task, items, options or {}))
+        status, payload = conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+
+class RemoteDetector(_RemoteModel):
+    """Stands in for the detector pipeline: `detector(sentences)` -> [{"label", "score"}]."""
+
+    def __call__(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self._call("classify", [sentences])
+        return self._call("classify", list(sentences))
+
+
+class RemoteParaphraser(_RemoteModel):
+    """Stands in for the paraphrase pipeline inside `batch_generate`."""
+
+    def generate(self, prompts, sources, **options):
+        return self._call("generate", list(zip(prompts, sources)), options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=os.environ.get("DN_BOT_INFERENCE_SERVER", DEFAULT_ADDRESS))
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+    serve(args.address, args.max_batch, args.max_wait_ms, args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,92 @@
 # utils/model_loaders.py
+import os
 import streamlit as st
-from transformers import pipeline
+from utils.sentence_cache import CACHE_DIR
+from utils.tracing import traced
+
+DETECTOR_MODEL_ID = "roberta-base-openai-detector"
+PARAPHRASE_MODEL_ID = "google/flan-t5-base"
+# First tier of the paraphrase cascade; set DN_BOT_SMALL_PARAPHRASE_MODEL= (empty) to disable
+SMALL_PARAPHRASE_MODEL_ID = os.environ.get("DN_BOT_SMALL_PARAPHRASE_MODEL", "google/flan-t5-small")
+
+# "pytorch" (fp32), "int8" (PyTorch dynamic quantization) or "onnx" (ONNX Runtime)
+BACKENDS = ("pytorch", "int8", "onnx")
+INFERENCE_BACKEND = os.environ.get("DN_BOT_BACKEND", "pytorch")
+ONNX_CACHE_DIR = os.path.join(CACHE_DIR, "onnx")
+# Address of a shared utils.inference_server, e.g. "unix:/tmp/dn-bot.sock" or "127.0.0.1:8765"
+INFERENCE_SERVER = os.environ.get("DN_BOT_INFERENCE_SERVER")
+
+
+def _onnx_model(task, model_id):
+    """Load an ONNX Runtime model, exporting it to ONNX_CACHE_DIR on first use."""
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError as exc:
+        raise ImportError(
+            "The onnx backend needs optimum with ONNX Runtime: pip install optimum[onnxruntime]"
+        ) from exc
+    model_cls = ORTModelForSequenceClassification if task == "text-classification" else ORTModelForSeq2SeqLM
+    export_dir = os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--"))
+    if os.path.isdir(export_dir) and os.listdir(export_dir):
+        return model_cls.from_pretrained(export_dir)
+    model = model_cls.from_pretrained(model_id, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+@traced("model.load")
+def build_pipeline(task, model_id, backend=None):
+    """Build a transformers pipeline for `model_id` on the requested inference backend."""
+    from transformers import pipeline
+
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "onnx":
+        from transformers import AutoTokenizer
+
+        return pipeline(
+            task, model=_onnx_model(task, model_id), tokenizer=AutoTokenizer.from_pretrained(model_id)
+        )
+
+    pipe = pipeline(task, model=model_id)
+    if backend == "int8":
+        import torch
+
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def model_tag(model_id, backend=None):
+    """Identifier for cached outputs; non-fp32 backends can shift scores slightly."""
+    backend = backend or INFERENCE_BACKEND
+    return model_id if backend == "pytorch" else f"{model_id}@{backend}"
+
 
 @st.cache_resource
-def load_detector_model():
+def load_detector_model(backend=None):
     """Load the roberta-base-openai-detector pipeline for AI text detection."""
-    return pipeline("text-classification", model="roberta-base-openai-detector")
+    if INFERENCE_SERVER:
+        from utils.inference_server import RemoteDetector
+
+        return RemoteDetector(INFERENCE_SERVER)
+    return build_pipeline("text-classification", DETECTOR_MODEL_ID, backend)
 
 @st.cache_resource
-def load_paraphrase_model():
+def load_paraphrase_model(backend=None):
     """Load the T5-based paraphrasing pipeline (e.g., google/flan-t5-base)."""
-    return pipeline("text2text-generation", model="google/flan-t5-base")
+    if INFERENCE_SERVER:
+        from utils.inference_server import RemoteParaphraser
+
+        return RemoteParaphraser(INFERENCE_SERVER)
+    return build_pipeline("text2text-generation", PARAPHRASE_MODEL_ID, backend)
+
+@st.cache_resource
+def load_small_paraphrase_model(backend=None):
+    """
+    Load the small first-tier paraphraser, or None when the cascade is disabled. With a
+    shared inference server the cascade is skipped so sessions do not load models locally.
+    """
+    if INFERENCE_SERVER or not SMALL_PARAPHRASE_MODEL_ID:
+        return None
+    return build_pipeline("text2text-generation", SMALL_PARAPHRASE_MODEL_ID, backend)
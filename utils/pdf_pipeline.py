@@ -0,0 +1,184 @@
+# utils/pdf_pipeline.py
+import fitz
+from io import BytesIO
+from utils.ai_detection_utils import (
+    CATEGORIES,
+    DEFAULT_BATCH_SIZE,
+    detect_sentences,
+    detect_sentences_packed,
+    label_result,
+    percentages_from_categories,
+    percentages_from_counts,
+    relabel,
+    score_arrays,
+)
+from utils.model_loaders import load_detector_model
+from utils.pdf_utils import (
+    PdfTextIndex,
+    add_legend_page,
+    annotate_spans,
+    extract_text_with_index,
+    generate_annotated_pdf,
+    sentence_spans,
+)
+from utils.sampling import estimate_percentages, sample_sizes, stratified_order
+
+DEFAULT_PAGES_PER_BATCH = 10
+
+
+def stream_pdf_detection(pdf_bytes, threshold=0.8, pages_per_batch=DEFAULT_PAGES_PER_BATCH,
+                         batch_size=DEFAULT_BATCH_SIZE, packed=False, annotated_path=None):
+    """
+    Extract, classify and annotate a PDF a batch of pages at a time.
+
+    Yields a progress dict after every page batch with `pages_done`, `total_pages`,
+    the running `classification_map` and `percentages`. The last sentence of a batch is
+    carried over to the next one, since it may continue on the following page. The final
+    progress dict also carries `text_index`, the `annotated_pdf` BytesIO, and the sentence
+    `spans` with their raw detector `raw_labels` and `scores` as NumPy arrays, so the
+    document can be relabeled at another threshold without running the model again.
+    With `packed`, each batch's sentences are scored in shared full-length windows.
+    With `annotated_path`, the annotated PDF is saved to that file and `annotated_pdf`
+    holds the path instead of an in-memory copy.
+    """
+    detector = load_detector_model()
+    detect = detect_sentences_packed if packed else detect_sentences
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    total_pages = doc.page_count
+    index = PdfTextIndex()
+    classification_map = {}
+    counts = dict.fromkeys(CATEGORIES, 0)
+    pending_start = 0
+    all_spans = []
+    all_results = []
+    stats = {"sentences": 0, "cache_hits": 0, "duplicates": 0, "seconds": 0.0, "sentences_per_sec": 0.0}
+
+    for batch_start in range(0, total_pages, pages_per_batch):
+        batch_end = min(batch_start + pages_per_batch, total_pages)
+        for page_no in range(batch_start, batch_end):
+            page = doc[page_no]
+            index.add_page(page_no, page.get_text("text"), page.get_text("words"))
+
+        # Headers and footers learned from the pages seen so far are blanked before splitting
+        index.filter_boilerplate(from_offset=pending_start)
+        spans = sentence_spans(index.clean_text[pending_start:], offset=pending_start)
+        is_last = batch_end == total_pages
+        if spans and not is_last:
+            pending_start = spans.pop()[0]
+        elif spans:
+            pending_start = spans[-1][1]
+
+        text = index.clean_text
+        sentences = [text[start:end] for start, end in spans]
+        batch_stats = {}
+        results = detect(detector, sentences, batch_size=batch_size, stats=batch_stats)
+        for key in ("sentences", "cache_hits", "duplicates", "seconds"):
+            stats[key] += batch_stats.get(key, 0)
+        if stats["seconds"] > 0:
+            stats["sentences_per_sec"] = round(stats["sentences"] / stats["seconds"], 2)
+        all_spans.extend(spans)
+        all_results.extend(results)
+        for sentence, result in zip(sentences, results):
+            label = label_result(result, threshold)
+            classification_map[sentence] = label
+            counts[label] += 1
+        annotate_spans(doc, index, spans, classification_map)
+
+        progress = {
+            "pages_done": batch_end,
+            "total_pages": total_pages,
+            "classification_map": classification_map,
+            "percentages": percentages_from_counts(counts),
+            "stats": stats,
+        }
+        if is_last:
+            add_legend_page(doc)
+            progress["text_index"] = index
+            if annotated_path:
+                doc.save(annotated_path)
+                progress["annotated_pdf"] = annotated_path
+            else:
+                progress["annotated_pdf"] = BytesIO(doc.write())
+            progress["spans"] = all_spans
+            progress["raw_labels"], progress["scores"] = score_arrays(all_results)
+        yield progress
+
+    if total_pages == 0:
+        yield {
+            "pages_done": 0,
+            "total_pages": 0,
+            "classification_map": {},
+            "percentages": percentages_from_counts(counts),
+            "stats": stats,
+            "text_index": index,
+            "annotated_pdf": None,
+            "spans": [],
+            "raw_labels": score_arrays([])[0],
+            "scores": score_arrays([])[1],
+        }
+    doc.close()
+
+
+def preview_pdf_detection(pdf_bytes, threshold=0.8, first_sample=200, seed=0,
+                          batch_size=DEFAULT_BATCH_SIZE, annotated_path=None):
+    """
+    Estimate the document's percentages from a page-stratified random sample of sentences,
+    then keep classifying growing samples until every sentence is done.
+
+    Yields a progress dict per sample with `sampled`, `total` and `estimates`
+    ({category: (pct, low, high)} at 95% confidence). The last one has `exact` set and the
+    same keys as the final `stream_pdf_detection` result. Callers that only need the
+    estimate can stop iterating early; sentences classified so far stay in the sentence cache.
+    `annotated_path` works as in `stream_pdf_detection`.
+    """
+    detector = load_detector_model()
+    index = extract_text_with_index(pdf_bytes)
+    spans = index.sentence_spans()
+    text = index.clean_text
+    total = len(spans)
+    order = stratified_order([index.page_at(start) for start, _ in spans], seed=seed)
+
+    results = [None] * total
+    stats = {"sentences": 0, "cache_hits": 0, "duplicates": 0, "seconds": 0.0, "sentences_per_sec": 0.0}
+    done = 0
+    for size in sample_sizes(total, first=first_sample):
+        chunk = order[done:size].tolist()
+        batch_stats = {}
+        chunk_results = detect_sentences(
+            detector, [text[spans[i][0]:spans[i][1]] for i in chunk], batch_size=batch_size, stats=batch_stats
+        )
+        for i, result in zip(chunk, chunk_results):
+            results[i] = result
+        for key in ("sentences", "cache_hits", "duplicates", "seconds"):
+            stats[key] += batch_stats.get(key, 0)
+        if stats["seconds"] > 0:
+            stats["sentences_per_sec"] = round(stats["sentences"] / stats["seconds"], 2)
+        done = size
+
+        sampled = [results[i] for i in order[:done].tolist()]
+        sample_labels, sample_scores = score_arrays(sampled)
+        progress = {
+            "sampled": done,
+            "total": total,
+            "estimates": estimate_percentages(relabel(sample_labels, sample_scores, threshold), total),
+            "exact": done == total,
+            "stats": stats,
+        }
+        if done == total:
+            raw_labels, scores = score_arrays(results)
+            categories = relabel(raw_labels, scores, threshold)
+            classification_map = {
+                text[start:end]: CATEGORIES[c] for (start, end), c in zip(spans, categories.tolist())
+            }
+            progress.update({
+                "classification_map": classification_map,
+                "percentages": percentages_from_categories(categories),
+                "text_index": index,
+                "annotated_pdf": generate_annotated_pdf(
+                    pdf_bytes, classification_map, text_index=index, out_path=annotated_path
+                ),
+                "spans": spans,
+                "raw_labels": raw_labels,
+                "scores": scores,
+            })
+        yield progress
@@ -1,63 +1,400 @@
 # utils/pdf_utils.py
+import atexit
 import fitz
+import multiprocessing
+import os
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from io import BytesIO
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
+from multiprocessing import shared_memory
+from typing import NamedTuple
+from utils.document import Document
+from utils.tracing import span
 
-nltk.download('punkt', quiet=True)
+# Worker processes for text extraction; PDFs with fewer pages are extracted serially,
+# since starting workers costs more than it saves
+EXTRACT_WORKERS = int(os.environ.get("DN_BOT_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARALLEL_MIN_PAGES = int(os.environ.get("DN_BOT_PARALLEL_MIN_PAGES", "100"))
 
-def extract_text_from_pdf(pdf_bytes):
-    """Extract text from all pages of a PDF."""
+
+class PageText(NamedTuple):
+    """One extracted page; `offset` is where its text starts in the joined document text."""
+    page_no: int
+    text: str
+    offset: int
+    # get_text("words") tuples, or None when words were not requested
+    words: list
+
+
+def _read_pages(doc, start, end, with_words):
+    return [
+        (page_no, doc[page_no].get_text("text"), doc[page_no].get_text("words") if with_words else None)
+        for page_no in range(start, end)
+    ]
+
+
+def _extract_page_range(shm_name, size, start, end, with_words):
+    """Worker: open a private document from the shared PDF bytes and read pages [start, end)."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        doc = fitz.open(stream=bytes(shm.buf[:size]), filetype="pdf")
+    finally:
+        shm.close()
+    try:
+        return _read_pages(doc, start, end, with_words)
+    finally:
+        doc.close()
+
+
+@lru_cache(maxsize=None)
+def _extraction_pool(workers):
+    """Worker pool kept for the life of the process, so later uploads skip process start-up."""
+    # spawn keeps torch/tokenizer threads out of forked children
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    atexit.register(pool.shutdown)
+    return pool
+
+
+def _extract_parallel(pdf_bytes, page_count, workers, with_words):
+    """Split the pages into `workers` contiguous ranges; None if the worker pool has died."""
+    bounds = [page_count * i // workers for i in range(workers + 1)]
+    shm = shared_memory.SharedMemory(create=True, size=len(pdf_bytes))
+    try:
+        shm.buf[:len(pdf_bytes)] = pdf_bytes
+        chunks = _extraction_pool(workers).map(
+            _extract_page_range,
+            [shm.name] * workers, [len(pdf_bytes)] * workers,
+            bounds[:-1], bounds[1:], [with_words] * workers,
+        )
+        return [page for chunk in chunks for page in chunk]
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; start a fresh one next time
+        _extraction_pool.cache_clear()
+        return None
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def extract_pages(pdf_bytes, with_words=False, workers=None, min_pages=PARALLEL_MIN_PAGES):
+    """
+    Text (and optionally word boxes) of every page as PageText tuples in page order.
+    PDFs of at least `min_pages` pages are split into contiguous page ranges read by
+    `workers` processes, each opening its own document from one shared copy of the bytes.
+    """
+    workers = EXTRACT_WORKERS if workers is None else workers
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = ""
-    for page in doc:
-        all_text += page.get_text("text") + "\n"
+    page_count = doc.page_count
+    with span("pdf.extract_pages", pages=page_count) as s:
+        raw_pages = None
+        if workers > 1 and page_count >= max(min_pages, 2):
+            workers = min(workers, page_count)
+            s.set(workers=workers)
+            raw_pages = _extract_parallel(pdf_bytes, page_count, workers, with_words)
+        if raw_pages is None:
+            s.set(workers=1)
+            raw_pages = _read_pages(doc, 0, page_count, with_words)
     doc.close()
+
+    pages = []
+    offset = 0
+    for page_no, text, words in raw_pages:
+        pages.append(PageText(page_no, text, offset, words))
+        offset += len(text) + 1
+    return pages
+
+
+def extract_text_from_pdf(pdf_bytes, workers=None):
+    """Extract text from all pages of a PDF; large PDFs are read by several processes."""
+    with span("pdf.extract_text") as s:
+        all_text = "".join(page.text + "\n" for page in extract_pages(pdf_bytes, workers=workers))
+        s.set(chars=len(all_text))
     return all_text
 
+
+def sentence_spans(text, offset=0):
+    """(start, end) character span of each sentence of text, shifted by `offset`."""
+    spans = Document.of(text).sentence_spans
+    if not offset:
+        return list(spans)
+    return [(offset + start, offset + end) for start, end in spans]
+
+
+# Running headers/footers: a line repeating at the same height on at least this many
+# pages, and on at least this fraction of the pages seen, is treated as boilerplate
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_MIN_FRACTION = 0.3
+# Vertical tolerance, in points, when matching line positions across pages
+BOILERPLATE_Y_BAND = 10
+
+_DIGITS = re.compile(r"\d+")
+
+
+class PdfTextIndex:
+    """
+    Extracted PDF text together with the character span, page and rectangle of every word,
+    so highlight rectangles for any span of the text can be looked up without searching pages.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._text = None
+        self._clean_text = None
+        self._document = None
+        self.length = 0
+        self.page_count = 0
+        self.word_starts = []
+        self.word_ends = []
+        self.word_lines = []  # (page number, block number, line number)
+        self.word_rects = []
+        self.word_boilerplate = []
+        # (line key, start, end, first word, end word, text) per text line
+        self.lines = []
+        self._line_pages = {}
+        self.boilerplate_spans = []
+        self._boilerplate_texts = {}
+
+    def add_page(self, page_no, page_text, words):
+        """Append one page's text and its `get_text("words")` tuples to the index."""
+        offset = self.length
+        cursor = 0
+        first_word = len(self.word_starts)
+        for x0, y0, x1, y1, word, block_no, line_no, _ in words:
+            pos = page_text.find(word, cursor)
+            if pos < 0:
+                continue
+            cursor = pos + len(word)
+            self.word_starts.append(offset + pos)
+            self.word_ends.append(offset + cursor)
+            self.word_lines.append((page_no, block_no, line_no))
+            self.word_rects.append((x0, y0, x1, y1))
+            self.word_boilerplate.append(False)
+        self._index_lines(page_no, page_text, offset, first_word)
+        self._parts.append(page_text + "\n")
+        self._text = None
+        self._clean_text = None
+        self._document = None
+        self.length += len(page_text) + 1
+        self.page_count += 1
+
+    def _index_lines(self, page_no, page_text, offset, first_word):
+        """Record each text line of the page just added, keyed by normalized text and height."""
+        i = first_word
+        n = len(self.word_starts)
+        while i < n:
+            j = i + 1
+            while j < n and self.word_lines[j] == self.word_lines[i]:
+                j += 1
+            text = " ".join(
+                page_text[self.word_starts[k] - offset:self.word_ends[k] - offset] for k in range(i, j)
+            )
+            normalized = _DIGITS.sub("#", text).strip().lower()
+            band = round(self.word_rects[i][1] / BOILERPLATE_Y_BAND)
+            key = (normalized, band)
+            self.lines.append((key, self.word_starts[i], self.word_ends[j - 1], i, j, text))
+            self._line_pages.setdefault(key, set()).add(page_no)
+            i = j
+
+    @property
+    def text(self):
+        """Full document text, identical to `extract_text_from_pdf`."""
+        if self._text is None:
+            self._text = "".join(self._parts)
+        return self._text
+
+    @property
+    def clean_text(self):
+        """The text with boilerplate spans blanked out by spaces, keeping every offset intact."""
+        if self._clean_text is None:
+            text = self.text
+            pieces = []
+            last = 0
+            for start, end in self.boilerplate_spans:
+                pieces.append(text[last:start])
+                pieces.append(" " * (end - start))
+                last = end
+            pieces.append(text[last:])
+            self._clean_text = "".join(pieces)
+        return self._clean_text
+
+    def filter_boilerplate(self, from_offset=0, min_pages=BOILERPLATE_MIN_PAGES,
+                           min_fraction=BOILERPLATE_MIN_FRACTION):
+        """
+        Mark lines starting at or after `from_offset` that repeat across pages (running
+        headers, footers, page numbers, banners) as boilerplate. Their words are never
+        highlighted and they are blanked in `clean_text`, so they are not classified.
+        """
+        needed = max(min_pages, min_fraction * self.page_count)
+        spans = []
+        for key, start, end, first, last, text in self.lines:
+            if start < from_offset or self.word_boilerplate[first]:
+                continue
+            if len(self._line_pages[key]) >= needed:
+                spans.append((start, end))
+                for w in range(first, last):
+                    self.word_boilerplate[w] = True
+                self._boilerplate_texts.setdefault(key, text)
+        if spans:
+            self.boilerplate_spans = sorted(self.boilerplate_spans + spans)
+            self._clean_text = None
+            self._document = None
+        return spans
+
+    def boilerplate_report(self):
+        """(example text, number of pages) for every kind of line filtered as boilerplate."""
+        return sorted(
+            ((text, len(self._line_pages[key])) for key, text in self._boilerplate_texts.items()),
+            key=lambda item: -item[1],
+        )
+
+    @property
+    def document(self):
+        """Shared tokenized Document for the boilerplate-free text."""
+        if self._document is None:
+            self._document = Document(self.clean_text)
+        return self._document
+
+    def sentence_spans(self):
+        """(start, end) character span of each sentence of the text."""
+        return self.document.sentence_spans
+
+    def page_at(self, offset):
+        """Page number of the first word starting at or after a character offset."""
+        i = bisect_right(self.word_ends, offset)
+        if i < len(self.word_lines):
+            return self.word_lines[i][0]
+        return self.word_lines[-1][0] if self.word_lines else 0
+
+    def rects_for_span(self, start, end):
+        """Highlight rectangles covering a character span, as {page number: [fitz.Rect]}, one per line."""
+        lines = {}
+        i = bisect_right(self.word_ends, start)
+        while i < len(self.word_starts) and self.word_starts[i] < end:
+            if self.word_boilerplate[i]:
+                i += 1
+                continue
+            rect = fitz.Rect(self.word_rects[i])
+            key = self.word_lines[i]
+            if key in lines:
+                lines[key] |= rect
+            else:
+                lines[key] = rect
+            i += 1
+        by_page = {}
+        for (page_no, _, _), rect in lines.items():
+            by_page.setdefault(page_no, []).append(rect)
+        return by_page
+
+
+def build_text_index(doc, filter_boilerplate=True):
+    """Index every page of an open fitz document in a single pass."""
+    index = PdfTextIndex()
+    with span("pdf.index_pages", pages=doc.page_count):
+        for page in doc:
+            index.add_page(page.number, page.get_text("text"), page.get_text("words"))
+    if filter_boilerplate:
+        with span("pdf.filter_boilerplate", pages=doc.page_count):
+            index.filter_boilerplate()
+    return index
+
+
+def extract_text_with_index(pdf_bytes, filter_boilerplate=True, workers=None):
+    """
+    Extract text from all pages of a PDF along with its word-position index.
+    Large PDFs are extracted in parallel (see `extract_pages`), then indexed in page order.
+    """
+    index = PdfTextIndex()
+    for page in extract_pages(pdf_bytes, with_words=True, workers=workers):
+        index.add_page(page.page_no, page.text, page.words)
+    if filter_boilerplate:
+        with span("pdf.filter_boilerplate", pages=index.page_count):
+            index.filter_boilerplate()
+    return index
+
 def word_count(text):
-    return len(word_tokenize(text))
+    return Document.of(text).word_count
 
-def generate_annotated_pdf(pdf_bytes, classification_map):
-    """Generate an annotated PDF with color-coded highlights for AI text."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    legend_text = (
-        "Color Legend:\n"
-        "• Red: AI-generated\n"
-        "• Orange: AI-generated & AI-refined\n"
-        "• Light Blue: Human-written & AI-refined\n\n"
-        "Note: Sentences classified as 'Human-written' are not highlighted."
-    )
-    legend_page = doc.new_page(pno=0)
-    legend_page.insert_text((72, 72), legend_text, fontsize=14, fontname="helv")
-
-    def hex_to_rgb_float(hex_color):
-        hex_color = hex_color.lstrip('#')
-        r = int(hex_color[0:2], 16) / 255.0
-        g = int(hex_color[2:4], 16) / 255.0
-        b = int(hex_color[4:6], 16) / 255.0
-        return (r, g, b)
-
-    COLOR_MAPPING = {
-        "AI-generated": "#ffcccc",
-        "AI-generated & AI-refined": "#ffe5cc",
-        "Human-written & AI-refined": "#e6f2ff"
-    }
-
-    for sentence, label in classification_map.items():
+
+LEGEND_TEXT = (
+    "Color Legend:\n"
+    "• Red: AI-generated\n"
+    "• Orange: AI-generated & AI-refined\n"
+    "• Light Blue: Human-written & AI-refined\n\n"
+    "Note: Sentences classified as 'Human-written' are not highlighted."
+)
+
+COLOR_MAPPING = {
+    "AI-generated": "#ffcccc",
+    "AI-generated & AI-refined": "#ffe5cc",
+    "Human-written & AI-refined": "#e6f2ff"
+}
+
+
+def hex_to_rgb_float(hex_color):
+    hex_color = hex_color.lstrip('#')
+    r = int(hex_color[0:2], 16) / 255.0
+    g = int(hex_color[2:4], 16) / 255.0
+    b = int(hex_color[4:6], 16) / 255.0
+    return (r, g, b)
+
+
+def annotate_spans(doc, text_index, spans, classification_map):
+    """Highlight the given sentence spans of `text_index` in an open document, by label."""
+    with span("pdf.highlight", sentences=len(spans)) as s:
+        s.set(highlights=_annotate_spans(doc, text_index, spans, classification_map))
+
+
+def _annotate_spans(doc, text_index, spans, classification_map):
+    text = text_index.clean_text
+    highlights = 0
+    for start, end in spans:
+        label = classification_map.get(text[start:end])
         if label == "Human-written":
             continue
         color_hex = COLOR_MAPPING.get(label)
         if not color_hex:
             continue
         color = hex_to_rgb_float(color_hex)
-        for page in doc:
-            rects = page.search_for(sentence)
-            for rect in rects:
-                annot = page.add_highlight_annot(rect)
-                annot.set_colors(stroke=color)
-                annot.update()
+        for page_no, rects in text_index.rects_for_span(start, end).items():
+            # Keep the page referenced: an annotation is unbound once its page is collected
+            page = doc[page_no]
+            annot = page.add_highlight_annot(rects)
+            annot.set_colors(stroke=color)
+            annot.update()
+            highlights += 1
+    return highlights
+
+
+def add_legend_page(doc):
+    """Insert the color legend as the first page. Call once annotation is finished."""
+    legend_page = doc.new_page(pno=0)
+    legend_page.insert_text((72, 72), LEGEND_TEXT, fontsize=14, fontname="helv")
+
+
+def generate_annotated_pdf(pdf_bytes, classification_map, text_index=None, out_path=None):
+    """
+    Generate an annotated PDF with color-coded highlights for AI text.
+    Highlight positions come from `text_index`, so each sentence only touches the pages
+    it actually appears on. Without one, the index is built here from the unfiltered
+    text, matching a map classified from `extract_text_from_pdf`; pass the index whose
+    `document` was classified to skip headers and footers. With `out_path` the PDF is
+    saved straight to that file and the path is returned instead of a BytesIO copy.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    if text_index is None:
+        # The map's keys are slices of the raw text, so boilerplate must not be blanked
+        text_index = build_text_index(doc, filter_boilerplate=False)
+    annotate_spans(doc, text_index, text_index.sentence_spans(), classification_map)
+    add_legend_page(doc)
 
-    out_bytes = doc.write()
+    with span("pdf.write", pages=doc.page_count):
+        if out_path:
+            doc.save(out_path)
+            doc.close()
+            return out_path
+        out_bytes = doc.write()
     doc.close()
     return BytesIO(out_bytes)
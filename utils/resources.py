@@ -0,0 +1,98 @@
+# utils/resources.py
+import os
+import ssl
+import threading
+from functools import lru_cache
+from utils.tracing import traced
+
+# With DN_BOT_OFFLINE=1 nothing is downloaded; missing data raises instead
+OFFLINE = os.environ.get("DN_BOT_OFFLINE", "0") == "1"
+
+# NLTK resource name -> path checked with nltk.data.find
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "wordnet": "corpora/wordnet",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+}
+TOKENIZER_RESOURCES = ("punkt", "punkt_tab")
+
+SPACY_MODEL = "en_core_web_sm"
+
+_ensured = set()
+_lock = threading.Lock()
+_warmup_thread = None
+
+
+def _allow_unverified_https():
+    try:
+        _create_unverified_https_context = ssl._create_unverified_context
+    except AttributeError:
+        pass
+    else:
+        ssl._create_default_https_context = _create_unverified_https_context
+
+
+def ensure_nltk(*names):
+    """Make sure NLTK data is available, downloading only what is missing locally."""
+    if all(name in _ensured for name in names):
+        return
+    import nltk
+
+    with _lock:
+        for name in names:
+            if name in _ensured:
+                continue
+            try:
+                nltk.data.find(NLTK_RESOURCES.get(name, name))
+            except LookupError:
+                if OFFLINE:
+                    raise LookupError(
+                        f"NLTK resource {name!r} is missing and DN_BOT_OFFLINE is set. "
+                        f"Install it with: python -m nltk.downloader {name}"
+                    )
+                _allow_unverified_https()
+                nltk.download(name, quiet=True)
+            _ensured.add(name)
+
+
+@lru_cache(maxsize=None)
+@traced("spacy.load")
+def get_spacy_model(name=SPACY_MODEL):
+    """Load a spaCy pipeline once, downloading it if missing. Returns None if unavailable."""
+    import spacy
+
+    try:
+        return spacy.load(name)
+    except OSError:
+        if OFFLINE:
+            return None
+    try:
+        from spacy.cli import download
+
+        download(name)
+        return spacy.load(name)
+    except (OSError, SystemExit):
+        return None
+
+
+def warm_up_in_background():
+    """Load NLTK data and both models in a daemon thread so the first request is fast."""
+    global _warmup_thread
+    if _warmup_thread is not None:
+        return _warmup_thread
+
+    def _warm_up():
+        from utils.model_loaders import load_detector_model, load_paraphrase_model
+        from utils.synonyms import load_synonym_table
+
+        ensure_nltk(*NLTK_RESOURCES)
+        get_spacy_model()
+        load_synonym_table()
+        load_detector_model()
+        load_paraphrase_model()
+
+    _warmup_thread = threading.Thread(target=_warm_up, name="dn-bot-warmup", daemon=True)
+    _warmup_thread.start()
+    return _warmup_thread
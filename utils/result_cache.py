@@ -0,0 +1,69 @@
+# utils/result_cache.py
+import hashlib
+import os
+import sys
+import threading
+from cachetools import TTLCache
+
+MAX_RESULT_BYTES = int(os.environ.get("DN_BOT_RESULT_CACHE_MB", "256")) * 1024 * 1024
+RESULT_TTL_SECONDS = int(os.environ.get("DN_BOT_RESULT_CACHE_TTL", "3600"))
+# Elements measured per list, dict or set; the rest are assumed to be of the same average size
+SIZE_SAMPLES = 16
+
+
+def approx_size(obj):
+    """
+    Approximate bytes retained by `obj` and everything it references. Large containers
+    are measured from a few evenly spaced elements, so a result with hundreds of
+    thousands of word tuples is sized in milliseconds.
+    """
+    if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):
+        # NumPy arrays report their own buffer in getsizeof; views only count the header
+        return max(sys.getsizeof(obj), obj.nbytes)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        items = list(obj.items())
+        return sys.getsizeof(obj) + _sampled_size(items, lambda kv: approx_size(kv[0]) + approx_size(kv[1]))
+    if isinstance(obj, (set, frozenset)):
+        return sys.getsizeof(obj) + _sampled_size(list(obj), approx_size)
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + _sampled_size(obj, approx_size)
+    if hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + approx_size(vars(obj))
+    return sys.getsizeof(obj)
+
+
+def _sampled_size(items, size_of):
+    n = len(items)
+    if n <= SIZE_SAMPLES:
+        return sum(size_of(item) for item in items)
+    step = n / SIZE_SAMPLES
+    sample = [items[int(i * step)] for i in range(SIZE_SAMPLES)]
+    return int(sum(size_of(item) for item in sample) / SIZE_SAMPLES * n)
+
+
+# Shared by every session of this process; bounded by approximate bytes held and by age
+_results = TTLCache(maxsize=MAX_RESULT_BYTES, ttl=RESULT_TTL_SECONDS, getsizeof=approx_size)
+_lock = threading.Lock()
+
+
+def result_key(pdf_bytes, **settings):
+    """Key for a processed upload: hash of the PDF bytes plus the detector settings."""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    params = ",".join(f"{k}={settings[k]}" for k in sorted(settings))
+    return f"{digest}|{params}"
+
+
+def get_result(key):
+    with _lock:
+        return _results.get(key)
+
+
+def store_result(key, result):
+    """Cache a finished result; one larger than the whole budget is simply not cached."""
+    with _lock:
+        try:
+            _results[key] = result
+        except ValueError:
+            _results.pop(key, None)
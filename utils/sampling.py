@@ -0,0 +1,57 @@
+# utils/sampling.py
+import math
+import numpy as np
+from utils.ai_detection_utils import CATEGORIES
+
+Z_95 = 1.96
+
+
+def stratified_order(strata, seed=0):
+    """
+    Order item indices so that every prefix is close to a proportional stratified sample.
+    Items are shuffled within their stratum (e.g. their page) and interleaved by relative rank.
+    """
+    rng = np.random.default_rng(seed)
+    strata = np.asarray(strata)
+    keys = np.empty(len(strata), dtype=np.float64)
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        ranks = rng.permutation(len(members))
+        keys[members] = (ranks + rng.random(len(members))) / len(members)
+    return np.argsort(keys, kind="stable")
+
+
+def sample_sizes(total, first=200, growth=2.0):
+    """Cumulative sample sizes: `first`, then growing geometrically up to `total`."""
+    sizes = []
+    n = min(first, total)
+    while n < total:
+        sizes.append(n)
+        n = min(total, int(math.ceil(n * growth)))
+    sizes.append(total)
+    return sizes
+
+
+def estimate_percentages(categories, population, z=Z_95):
+    """
+    Category percentages estimated from a sample of category indices, with Wilson score
+    intervals whose bounds are pulled toward the estimate by the finite population
+    correction. Returns {category: (pct, low, high)}.
+    """
+    n = len(categories)
+    if n == 0:
+        return {cat: (0.0, 0.0, 100.0) for cat in CATEGORIES}
+    counts = np.bincount(categories, minlength=len(CATEGORIES))
+    # 0 once the whole population is sampled, so the interval collapses onto the estimate
+    fpc = math.sqrt((population - n) / (population - 1)) if population > 1 else 0.0
+    estimates = {}
+    for cat, count in zip(CATEGORIES, counts.tolist()):
+        p = count / n
+        denom = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denom
+        half = z / denom * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        # The Wilson interval is not centred on p, so shrink each bound toward p
+        low = p - (p - max(0.0, center - half)) * fpc
+        high = p + (min(1.0, center + half) - p) * fpc
+        estimates[cat] = (round(p * 100, 2), round(low * 100, 2), round(high * 100, 2))
+    return estimates
@@ -0,0 +1,121 @@
+# utils/sentence_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+CACHE_DIR = os.environ.get(
+    "DN_BOT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dn-bot")
+)
+DEFAULT_MAX_ENTRIES = int(os.environ.get("DN_BOT_SENTENCE_CACHE_MAX", "200000"))
+
+# SQLite limits the number of bound parameters per statement
+_CHUNK = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sentence(sentence):
+    """Collapse whitespace so re-extracted copies of a sentence share one cache entry."""
+    return _WHITESPACE.sub(" ", sentence).strip()
+
+
+def sentence_key(sentence, model_id):
+    """Content address of a sentence for a given model."""
+    payload = f"{model_id}\0{normalize_sentence(sentence)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SentenceCache:
+    """
+    Disk-backed cache of raw detector outputs ({"label", "score"}) per sentence.
+    Backed by SQLite in WAL mode so several Streamlit processes can share one file;
+    entries are evicted least-recently-used once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "sentence_cache.sqlite3")
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " label TEXT NOT NULL,"
+                " score REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model_id, sentences):
+        """Return {index: {"label", "score"}} for the sentences already cached."""
+        keys = [sentence_key(s, model_id) for s in sentences]
+        found = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), _CHUNK):
+            chunk = unique[i:i + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, label, score FROM entries WHERE key IN ({marks})", chunk
+            ).fetchall()
+            for key, label, score in rows:
+                found[key] = {"label": label, "score": score}
+            if rows:
+                conn.execute(
+                    f"UPDATE entries SET last_used = ? WHERE key IN ({marks})",
+                    [time.time(), *chunk],
+                )
+        return {i: found[k] for i, k in enumerate(keys) if k in found}
+
+    def put_many(self, model_id, sentences, results):
+        """Store detector results for sentences, then evict down to `max_entries`."""
+        now = time.time()
+        rows = [
+            (sentence_key(s, model_id), r["label"], float(r["score"]), now)
+            for s, r in zip(sentences, results)
+        ]
+        if not rows:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+            (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+@lru_cache(maxsize=1)
+def get_sentence_cache():
+    """Process-wide cache instance, or None when disabled with DN_BOT_SENTENCE_CACHE=0."""
+    if os.environ.get("DN_BOT_SENTENCE_CACHE", "1") == "0":
+        return None
+    return SentenceCache()
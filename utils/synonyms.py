@@ -0,0 +1,114 @@
+# utils/synonyms.py
+"""
+Memoized WordNet synonym lookups for the humanizer.
+
+An optional prebuilt table (`python -m utils.synonyms [path]`) is loaded once per process;
+words missing from it fall back to WordNet with bounded LRU memoization.
+"""
+import os
+import pickle
+import sys
+import threading
+from functools import lru_cache
+from nltk.corpus import wordnet
+from utils.resources import ensure_nltk
+from utils.sentence_cache import CACHE_DIR
+
+SYNONYM_TABLE_PATH = os.environ.get(
+    "DN_BOT_SYNONYM_TABLE", os.path.join(CACHE_DIR, "synonyms.pickle")
+)
+LOOKUP_CACHE_SIZE = 65536
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def wordnet_pos(pos):
+    """Map a spaCy coarse POS tag to a WordNet POS, or None."""
+    if pos.startswith("ADJ"):
+        return wordnet.ADJ
+    if pos.startswith("NOUN"):
+        return wordnet.NOUN
+    if pos.startswith("ADV"):
+        return wordnet.ADV
+    if pos.startswith("VERB"):
+        return wordnet.VERB
+    return None
+
+
+def _compute_synonyms(word, wn_pos):
+    synonyms = set()
+    for syn in wordnet.synsets(word, pos=wn_pos):
+        for lemma in syn.lemmas():
+            lemma_name = lemma.name().replace("_", " ")
+            if lemma_name.lower() != word:
+                synonyms.add(lemma_name)
+    return tuple(sorted(synonyms))
+
+
+def load_synonym_table(path=SYNONYM_TABLE_PATH):
+    """Load the prebuilt table once; an empty table is used when the file does not exist."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                table = {"synonyms": {}, "has_synsets": frozenset()}
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        table = pickle.load(f)
+                _table = table
+    return _table
+
+
+@lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _lookup_synonyms(word, wn_pos):
+    ensure_nltk("wordnet")
+    return _compute_synonyms(word, wn_pos)
+
+
+@lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _lookup_has_synsets(word):
+    ensure_nltk("wordnet")
+    return bool(wordnet.synsets(word))
+
+
+def has_synsets(word):
+    """True if WordNet knows the word under any part of speech."""
+    word = word.lower()
+    if word in load_synonym_table()["has_synsets"]:
+        return True
+    return _lookup_has_synsets(word)
+
+
+def get_synonyms(word, pos):
+    """Sorted tuple of WordNet synonyms of `word` for a spaCy POS tag, excluding the word itself."""
+    wn_pos = wordnet_pos(pos)
+    if not wn_pos:
+        return ()
+    word = word.lower()
+    hit = load_synonym_table()["synonyms"].get((word, wn_pos))
+    if hit is not None:
+        return hit
+    return _lookup_synonyms(word, wn_pos)
+
+
+def build_synonym_table(path=SYNONYM_TABLE_PATH):
+    """Precompute synonyms for every single-word WordNet lemma and pickle them to `path`."""
+    ensure_nltk("wordnet")
+    synonyms = {}
+    words = set()
+    for wn_pos in (wordnet.ADJ, wordnet.NOUN, wordnet.ADV, wordnet.VERB):
+        for name in wordnet.all_lemma_names(pos=wn_pos):
+            if "_" in name:
+                continue
+            words.add(name)
+            synonyms[(name, wn_pos)] = _compute_synonyms(name, wn_pos)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump({"synonyms": synonyms, "has_synsets": frozenset(words)}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+if __name__ == "__main__":
+    print(build_synonym_table(*sys.argv[1:2]))
@@ -0,0 +1,202 @@
+# utils/tracing.py
+"""
+Lightweight per-stage timing for the whole process.
+
+    with span("detector.inference", sentences=len(batch)) as s:
+        ...
+        s.set(tokens=n_tokens)
+
+    @traced("model.load")
+    def build_pipeline(...): ...
+
+Every span adds its wall time and numeric attributes (sentence and token counts, batch
+sizes, ...) to per-name totals. DN_BOT_TRACE_LOG appends one JSON line per finished span;
+DN_BOT_METRICS_FILE is rewritten in the Prometheus text format at most every
+METRICS_INTERVAL seconds and at exit. DN_BOT_TRACING=0 turns spans into no-ops.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACING = os.environ.get("DN_BOT_TRACING", "1") != "0"
+TRACE_LOG = os.environ.get("DN_BOT_TRACE_LOG")
+METRICS_FILE = os.environ.get("DN_BOT_METRICS_FILE")
+METRICS_INTERVAL = 10.0
+RECENT_SPANS = 200
+
+_lock = threading.Lock()
+_local = threading.local()
+_totals = {}
+_recent = deque(maxlen=RECENT_SPANS)
+_last_export = 0.0
+
+
+class Span:
+    """A timed stage; numeric attributes are summed into the per-name totals."""
+
+    __slots__ = ("name", "path", "attrs", "start", "seconds")
+
+    def __init__(self, name, path, attrs):
+        self.name = name
+        self.path = path
+        self.attrs = attrs
+        self.start = time.time()
+        self.seconds = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _record(s):
+    global _last_export
+    with _lock:
+        total = _totals.setdefault(s.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "attrs": {}})
+        total["count"] += 1
+        total["seconds"] += s.seconds
+        total["max_seconds"] = max(total["max_seconds"], s.seconds)
+        for key, value in s.attrs.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total["attrs"][key] = total["attrs"].get(key, 0) + value
+        record = {"span": s.name, "path": s.path, "start": round(s.start, 3),
+                  "seconds": round(s.seconds, 6), **s.attrs}
+        _recent.append(record)
+        export_metrics = METRICS_FILE and time.monotonic() - _last_export >= METRICS_INTERVAL
+        if export_metrics:
+            _last_export = time.monotonic()
+    if TRACE_LOG:
+        with _lock, open(TRACE_LOG, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+    if export_metrics:
+        write_prometheus(METRICS_FILE)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as stage `name`, nested under any enclosing span."""
+    if not TRACING:
+        yield _NULL_SPAN
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    path = "/".join([*stack, name])
+    s = Span(name, path, attrs)
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.seconds = time.perf_counter() - start
+        stack.pop()
+        _record(s)
+
+
+def traced(name=None):
+    """Decorator form of `span`; the span is named after the function by default."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """Per-stage totals, slowest first: [{"span", "count", "seconds", "mean_seconds", ...}]."""
+    with _lock:
+        rows = [
+            {
+                "span": name,
+                "count": t["count"],
+                "seconds": round(t["seconds"], 4),
+                "mean_seconds": round(t["seconds"] / t["count"], 4),
+                "max_seconds": round(t["max_seconds"], 4),
+                **t["attrs"],
+            }
+            for name, t in _totals.items()
+        ]
+    return sorted(rows, key=lambda r: r["seconds"], reverse=True)
+
+
+def recent_spans(limit=50):
+    """The most recent finished spans, newest first."""
+    with _lock:
+        return list(_recent)[-limit:][::-1]
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+        _recent.clear()
+
+
+def _metric_name(attr):
+    return "".join(c if c.isalnum() else "_" for c in attr)
+
+
+def prometheus_text():
+    """All per-stage totals in the Prometheus text exposition format."""
+    with _lock:
+        totals = {name: dict(t, attrs=dict(t["attrs"])) for name, t in _totals.items()}
+    families = {
+        "dn_bot_span_count_total": ("counter", "Finished spans per stage", lambda t: t["count"]),
+        "dn_bot_span_seconds_total": ("counter", "Wall time per stage", lambda t: t["seconds"]),
+        "dn_bot_span_seconds_max": ("gauge", "Slowest single span per stage", lambda t: t["max_seconds"]),
+    }
+    for attr in sorted({a for t in totals.values() for a in t["attrs"]}):
+        families[f"dn_bot_span_{_metric_name(attr)}_total"] = (
+            "counter", f"Sum of {attr} per stage", lambda t, attr=attr: t["attrs"].get(attr)
+        )
+    lines = []
+    for metric, (kind, help_text, value_of) in families.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, t in sorted(totals.items()):
+            value = value_of(t)
+            if value is not None:
+                lines.append(f'{metric}{{span="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically replace `path` with the current metrics, e.g. for node_exporter's textfile collector."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def render_sidebar():
+    """Show per-stage totals and the latest spans in the Streamlit sidebar."""
+    import streamlit as st
+
+    with st.sidebar.expander("Timings", expanded=True):
+        rows = summary()
+        if not rows:
+            st.write("No traced stages yet.")
+            return
+        st.dataframe(rows, use_container_width=True)
+        st.caption("Latest spans")
+        st.dataframe(recent_spans(20), use_container_width=True)
+        if st.button("Reset timings"):
+            reset()
+
+
+if METRICS_FILE:
+    atexit.register(lambda: write_prometheus(METRICS_FILE))